@@ -2,18 +2,51 @@
 # UPDATED: Added random shuffling of questions when a new quiz is started.
 
 import os
-from datetime import datetime, timedelta
+import sys
+from datetime import datetime, timedelta, timezone
 import jwt
 from functools import wraps
-from flask import Flask, jsonify, request, make_response
+from flask import Flask, jsonify, request, make_response, Response, stream_with_context, g, has_request_context, send_from_directory
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
-from flask_bcrypt import Bcrypt
+from sqlalchemy.orm import load_only
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from dotenv import load_dotenv
+import passwords
+from ratelimit import RateLimiter, create_backend
+from migrations import run_migrations
+import dbpool
+import metrics
+import jobs
+from time import perf_counter
+from passwords import PasswordHasherBusy
 import random # NEW: Import the random module for shuffling
 from time import time
 from collections import defaultdict
-
+import threading
+from types import MappingProxyType
+import json
+import csv
+import io
+import gzip
+import hashlib
+import hmac
+from collections import OrderedDict, namedtuple, Counter
+from array import array
+from bisect import bisect_right
+from itertools import accumulate
+
+try:
+    import brotli  # optional: only used when RESPONSE_COMPRESSION allows "br"
+except ImportError:
+    brotli = None
+
+
+# When run as `python app.py` this module is __main__. Register it as `app`
+# too, so modules that `from app import ...` (seed.py, via the reseed job)
+# reuse it instead of importing a second copy with its own db and registry.
+sys.modules.setdefault("app", sys.modules[__name__])
 
 load_dotenv() 
 
@@ -28,10 +61,11 @@ database_url = os.environ["SQLALCHEMY_DATABASE_URI"]
 app.config["SQLALCHEMY_DATABASE_URI"] = database_url
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
+# Pool sizing, recycle, pre-ping and PgBouncer mode come from DB_* env vars (see dbpool.py)
+_connect_args = {}
 if database_url.startswith("postgres") and "sslmode=" not in database_url:
-    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-        "connect_args": {"sslmode": "require"}
-    }
+    _connect_args["sslmode"] = "require"
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = dbpool.engine_options(database_url, _connect_args)
 
 # Also require this from env; do NOT print it
 ADMIN_PASSCODE = os.environ["ADMIN_PASSCODE"]
@@ -51,36 +85,48 @@ CORS(
 
 
 db = SQLAlchemy(app)
-bcrypt = Bcrypt(app)
 
-# --- Simple in-memory rate limiter for admin passcode ---
-# Allow 5 attempts per 5 minutes per IP (dev-safe; swap for Redis in prod).
-ADMIN_RATE_WINDOW = 5 * 60  # seconds
-ADMIN_RATE_MAX = 5
-_admin_attempts = defaultdict(list)  # ip -> [timestamps]
+# --- Rate limiting ---
+# Sliding-window limiters from ratelimit.py. Storage is chosen by
+# RATE_LIMIT_BACKEND (per-process memory by default; a shared SQLite file or
+# Redis keeps limits consistent across gunicorn workers and containers).
+_rate_limit_backend = create_backend()
+
+def _env_limit(name, default_max, default_window):
+    return RateLimiter(
+        name.lower(),
+        int(os.environ.get(f"{name}_RATE_MAX", default_max)),
+        float(os.environ.get(f"{name}_RATE_WINDOW", default_window)),
+        _rate_limit_backend,
+    )
+
+# Admin passcode: 5 attempts per 5 minutes per IP
+admin_limiter = _env_limit("ADMIN", 5, 5 * 60)
+# Login: 10 attempts per 5 minutes per IP
+login_limiter = _env_limit("LOGIN", 10, 5 * 60)
+# Quiz traffic, per user. Generous; meant to stop runaway clients, not students.
+quiz_start_limiter = _env_limit("QUIZ_START", 30, 60)
+quiz_answer_limiter = _env_limit("QUIZ_ANSWER", 600, 60)
 
 def _admin_rate_limited(ip: str) -> bool:
-    now = time()
-    # Drop stale attempts outside the window
-    _admin_attempts[ip] = [t for t in _admin_attempts[ip] if now - t < ADMIN_RATE_WINDOW]
-    if len(_admin_attempts[ip]) >= ADMIN_RATE_MAX:
-        return True
-    _admin_attempts[ip].append(now)
-    return False
-
-# --- Simple in-memory rate limiter for LOGIN ---
-# Allow 10 attempts per 5 minutes per IP (dev-safe; use Redis in prod).
-LOGIN_RATE_WINDOW = 5 * 60  # seconds
-LOGIN_RATE_MAX = 10
-_login_attempts = defaultdict(list)  # ip -> [timestamps]
+    return admin_limiter.hit(ip)
 
 def _login_rate_limited(ip: str) -> bool:
-    now = time()
-    _login_attempts[ip] = [t for t in _login_attempts[ip] if now - t < LOGIN_RATE_WINDOW]
-    if len(_login_attempts[ip]) >= LOGIN_RATE_MAX:
-        return True
-    _login_attempts[ip].append(now)
-    return False
+    return login_limiter.hit(ip)
+
+def user_rate_limited(limiter):
+    """Refuse with 429 once the authenticated user exceeds ``limiter``.
+
+    Place below @token_required so the view receives ``current_user``.
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(current_user, *args, **kwargs):
+            if limiter.hit(current_user.id):
+                return jsonify({'message': 'Too many requests, please slow down'}), 429
+            return f(current_user, *args, **kwargs)
+        return wrapper
+    return decorator
 
 
 def is_production() -> bool:
@@ -96,13 +142,19 @@ class User(db.Model):
     attempts = db.relationship('QuizAttempt', backref='user', lazy=True)
     is_admin = db.Column(db.Boolean, default=False, nullable=False)
 
+    # Both run in the passwords process pool and may raise PasswordHasherBusy.
     def set_password(self, password):
-        self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+        self.password_hash = passwords.hash_password(password)
 
     def check_password(self, password):
-        return bcrypt.check_password_hash(self.password_hash, password)
+        return passwords.check_password(password, self.password_hash)
 
 class Question(db.Model):
+    # Indexes mirror migrations.py so fresh and migrated databases match.
+    __table_args__ = (
+        db.Index('ix_question_category_difficulty', 'category', 'difficulty'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     question = db.Column(db.Text, nullable=False)
     optionA = db.Column(db.String(255), nullable=True)
@@ -126,6 +178,13 @@ class Question(db.Model):
         }
 
 class QuizAttempt(db.Model):
+    __table_args__ = (
+        db.Index('ix_quiz_attempt_user_complete_ts', 'user_id', 'is_complete', 'timestamp'),
+        db.Index('ix_quiz_attempt_user_ts', 'user_id', 'timestamp', 'id'),
+        db.Index('ix_quiz_attempt_complete_user', 'is_complete', 'user_id'),
+        db.Index('ix_quiz_attempt_ts_id', 'timestamp', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     test_name = db.Column(db.String(128), nullable=False)
     score = db.Column(db.Integer, nullable=True)
@@ -151,36 +210,1069 @@ class QuizAttempt(db.Model):
             'results_by_category': self.results_by_category
         }
 
+    # Columns needed for list views; the JSON blobs are never loaded.
+    SUMMARY_COLUMNS = ('id', 'test_name', 'score', 'total_questions', 'timestamp', 'user_id', 'is_complete')
+
+    def to_summary_dict(self):
+        return {
+            'id': self.id,
+            'test_name': self.test_name,
+            'score': self.score,
+            'total_questions': self.total_questions,
+            'timestamp': self.timestamp.isoformat(),
+            'user_id': self.user_id,
+            'is_complete': self.is_complete
+        }
+
+class AttemptAnswer(db.Model):
+    # Narrow write-behind buffer: one row per (attempt, question). Saving an
+    # answer upserts a row here instead of rewriting QuizAttempt.answers; the
+    # rows are folded into the JSON column on resume and submit. While the
+    # attempt is open, rows are kept after folding: their answered_at is what
+    # last-write-wins compares against, so a replayed older answer can never
+    # displace a newer one. Submit closes the attempt to further answers and
+    # purges its rows (see purge_pending_answers).
+    attempt_id = db.Column(db.Integer, db.ForeignKey('quiz_attempt.id'), primary_key=True)
+    question_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    answer = db.Column(db.JSON, nullable=True)
+    answered_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+def upsert_attempt_answers(rows, last_write_wins=False):
+    """Insert-or-replace buffered answers (dicts of AttemptAnswer columns).
+
+    With ``last_write_wins`` an existing row is only replaced when the
+    incoming ``answered_at`` is not older than the stored one.
+    """
+    if not rows:
+        return
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        insert = sqlite_insert if dialect == 'sqlite' else pg_insert
+        stmt = insert(AttemptAnswer).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['attempt_id', 'question_id'],
+            set_={'answer': stmt.excluded.answer, 'answered_at': stmt.excluded.answered_at},
+            where=(AttemptAnswer.answered_at <= stmt.excluded.answered_at) if last_write_wins else None,
+        )
+        db.session.execute(stmt)
+    else:
+        for row in rows:
+            existing = db.session.get(AttemptAnswer, (row['attempt_id'], row['question_id']))
+            if existing is None:
+                db.session.add(AttemptAnswer(**row))
+            elif not last_write_wins or existing.answered_at <= row['answered_at']:
+                existing.answer = row['answer']
+                existing.answered_at = row['answered_at']
+
+
+def pending_answers(attempt_ids):
+    """Buffered answers grouped as {attempt_id: {question_id_str: answer}}."""
+    pending = defaultdict(dict)
+    if attempt_ids:
+        rows = (
+            db.session.query(AttemptAnswer.attempt_id, AttemptAnswer.question_id, AttemptAnswer.answer)
+            .filter(AttemptAnswer.attempt_id.in_(attempt_ids))
+            .all()
+        )
+        for attempt_id, question_id, answer in rows:
+            pending[attempt_id][str(question_id)] = answer
+    return pending
+
+
+def fold_pending_answers(attempt):
+    """Merge buffered answers into ``attempt.answers``.
+
+    The buffer rows stay in place until submit (see AttemptAnswer). Returns True if
+    ``attempt.answers`` changed; the caller commits.
+    """
+    rows = (
+        db.session.query(AttemptAnswer.question_id, AttemptAnswer.answer)
+        .filter(AttemptAnswer.attempt_id == attempt.id)
+        .all()
+    )
+    current = attempt.answers or {}
+    answers = dict(current)
+    for question_id, answer in rows:
+        answers[str(question_id)] = answer
+    if answers == current:
+        return False
+    attempt.answers = answers
+    return True
+
+
+def purge_pending_answers(attempt_id):
+    """Drop a submitted attempt's buffer rows; the caller commits."""
+    (AttemptAnswer.query
+     .filter(AttemptAnswer.attempt_id == attempt_id)
+     .delete(synchronize_session=False))
+
+
+class UserCategoryProgress(db.Model):
+    # Running per-user, per-category totals, maintained by submit_quiz so the
+    # progress endpoint never has to replay attempt history.
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    category = db.Column(db.String(100), primary_key=True)
+    correct = db.Column(db.Integer, default=0, nullable=False)
+    total = db.Column(db.Integer, default=0, nullable=False)
+    attempt_count = db.Column(db.Integer, default=0, nullable=False)
+    last_attempt_at = db.Column(db.DateTime, nullable=True)
+
+
+def apply_progress(user_id, results, when, sign=1):
+    """Fold one attempt's results_by_category into the user's aggregates.
+
+    Pass ``sign=-1`` to back out a previous result (e.g. on resubmission).
+    Changes are added to the current session; the caller commits.
+    """
+    for category, result in (results or {}).items():
+        row = db.session.get(UserCategoryProgress, (user_id, category))
+        if row is None:
+            row = UserCategoryProgress(user_id=user_id, category=category, correct=0, total=0, attempt_count=0)
+            db.session.add(row)
+        row.correct += sign * result['correct']
+        row.total += sign * result['total']
+        row.attempt_count += sign
+        if sign > 0 and when and (row.last_attempt_at is None or when > row.last_attempt_at):
+            row.last_attempt_at = when
+
+
+def rebuild_user_progress(user_id):
+    """Recompute a user's aggregates from their completed attempts."""
+    UserCategoryProgress.query.filter_by(user_id=user_id).delete()
+    rows = (
+        db.session.query(QuizAttempt.timestamp, QuizAttempt.results_by_category)
+        .filter(QuizAttempt.user_id == user_id, QuizAttempt.is_complete == True)
+        .all()
+    )
+    for when, results in rows:
+        apply_progress(user_id, results, when)
+
+
+_progress_backfill_done = False
+
+
+def ensure_progress_backfilled():
+    """Once per process, build aggregates for users whose history predates them."""
+    global _progress_backfill_done
+    if _progress_backfill_done:
+        return
+    missing = (
+        db.session.query(QuizAttempt.user_id)
+        .filter(QuizAttempt.is_complete == True)
+        .filter(~db.exists().where(UserCategoryProgress.user_id == QuizAttempt.user_id))
+        .distinct()
+        .all()
+    )
+    for (user_id,) in missing:
+        rebuild_user_progress(user_id)
+    if missing:
+        db.session.commit()
+    _progress_backfill_done = True
+
+
+class QuestionStat(db.Model):
+    # Global answer counts per question; p-correct drives adaptive selection.
+    question_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    seen = db.Column(db.Integer, default=0, nullable=False)
+    correct = db.Column(db.Integer, default=0, nullable=False)
+
+
+class UserQuestionHistory(db.Model):
+    # One narrow row per (user, question) ever graded; the primary key doubles
+    # as the per-user index the adaptive selector reads.
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    question_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    seen = db.Column(db.Integer, default=0, nullable=False)
+    correct = db.Column(db.Integer, default=0, nullable=False)
+    last_correct = db.Column(db.Boolean, default=False, nullable=False)
+    last_seen_at = db.Column(db.DateTime, nullable=True)
+
+
+# Rows per multi-row INSERT, keeping bound parameters under SQLite's limit.
+UPSERT_BATCH_SIZE = 500
+
+
+def upsert_question_history(rows):
+    """Add (user, question) counts; the newest ``last_seen_at`` sets ``last_correct``.
+
+    ``rows`` are dicts of UserQuestionHistory columns holding increments.
+    """
+    if not rows:
+        return
+    if len(rows) > UPSERT_BATCH_SIZE:
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            upsert_question_history(rows[start:start + UPSERT_BATCH_SIZE])
+        return
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        insert = sqlite_insert if dialect == 'sqlite' else pg_insert
+        stmt = insert(UserQuestionHistory).values(rows)
+        newer = db.or_(UserQuestionHistory.last_seen_at == None,
+                       stmt.excluded.last_seen_at >= UserQuestionHistory.last_seen_at)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['user_id', 'question_id'],
+            set_={
+                'seen': UserQuestionHistory.seen + stmt.excluded.seen,
+                'correct': UserQuestionHistory.correct + stmt.excluded.correct,
+                'last_correct': db.case((newer, stmt.excluded.last_correct), else_=UserQuestionHistory.last_correct),
+                'last_seen_at': db.case((newer, stmt.excluded.last_seen_at), else_=UserQuestionHistory.last_seen_at),
+            },
+        )
+        db.session.execute(stmt)
+    else:
+        for row in rows:
+            existing = db.session.get(UserQuestionHistory, (row['user_id'], row['question_id']))
+            if existing is None:
+                db.session.add(UserQuestionHistory(**row))
+                continue
+            existing.seen += row['seen']
+            existing.correct += row['correct']
+            if existing.last_seen_at is None or (row['last_seen_at'] and row['last_seen_at'] >= existing.last_seen_at):
+                existing.last_correct = row['last_correct']
+                existing.last_seen_at = row['last_seen_at']
+
+
+def upsert_question_stats(rows):
+    """Add {'question_id', 'seen', 'correct'} increments to QuestionStat."""
+    if not rows:
+        return
+    if len(rows) > UPSERT_BATCH_SIZE:
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            upsert_question_stats(rows[start:start + UPSERT_BATCH_SIZE])
+        return
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        insert = sqlite_insert if dialect == 'sqlite' else pg_insert
+        stmt = insert(QuestionStat).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['question_id'],
+            set_={'seen': QuestionStat.seen + stmt.excluded.seen,
+                  'correct': QuestionStat.correct + stmt.excluded.correct},
+        )
+        db.session.execute(stmt)
+    else:
+        for row in rows:
+            existing = db.session.get(QuestionStat, row['question_id'])
+            if existing is None:
+                db.session.add(QuestionStat(**row))
+            else:
+                existing.seen += row['seen']
+                existing.correct += row['correct']
+
+
+def record_question_outcomes(user_id, outcomes, when):
+    """Fold one graded attempt's (question_id, is_correct) pairs into the stats tables."""
+    if not outcomes:
+        return
+    upsert_question_history([
+        {'user_id': user_id, 'question_id': qid, 'seen': 1, 'correct': int(ok),
+         'last_correct': ok, 'last_seen_at': when}
+        for qid, ok in outcomes
+    ])
+    upsert_question_stats([{'question_id': qid, 'seen': 1, 'correct': int(ok)} for qid, ok in outcomes])
+
+
+def _count_outcomes(history, user_id, outcomes, when):
+    """Accumulate (question_id, is_correct) pairs into {(user, question): history row}."""
+    for qid, ok in outcomes:
+        row = history.get((user_id, qid))
+        if row is None:
+            row = history[(user_id, qid)] = {'user_id': user_id, 'question_id': qid, 'seen': 0,
+                                             'correct': 0, 'last_correct': ok, 'last_seen_at': when}
+        row['seen'] += 1
+        row['correct'] += ok
+        if when and (row['last_seen_at'] is None or when >= row['last_seen_at']):
+            row['last_correct'], row['last_seen_at'] = ok, when
+
+
+def rebuild_question_history(user_id, question_ids):
+    """Recount a user's history for ``question_ids`` from their completed attempts.
+
+    Used on resubmission, where the attempt's earlier outcomes must be backed
+    out: the rows come out as regrade_attempts would build them, and
+    QuestionStat moves by the difference. The caller commits.
+    """
+    wanted = set(question_ids or ())
+    if not wanted:
+        return
+    snapshot = get_question_snapshot()
+    before = {
+        qid: (seen, correct)
+        for qid, seen, correct in db.session.query(
+            UserQuestionHistory.question_id, UserQuestionHistory.seen, UserQuestionHistory.correct,
+        ).filter(UserQuestionHistory.user_id == user_id, UserQuestionHistory.question_id.in_(wanted))
+    }
+    history = {}
+    attempts = (
+        db.session.query(QuizAttempt.timestamp, QuizAttempt.question_ids, QuizAttempt.answers)
+        .filter(QuizAttempt.user_id == user_id, QuizAttempt.is_complete == True)
+    )
+    for when, attempt_question_ids, answers in attempts:
+        overlap = wanted.intersection(attempt_question_ids or ())
+        if overlap:
+            outcomes = []
+            snapshot.grade(overlap, answers, outcomes)
+            _count_outcomes(history, user_id, outcomes, when)
+    (UserQuestionHistory.query
+     .filter(UserQuestionHistory.user_id == user_id, UserQuestionHistory.question_id.in_(wanted))
+     .delete(synchronize_session=False))
+    upsert_question_history(list(history.values()))
+    deltas = []
+    for qid in wanted:
+        row = history.get((user_id, qid))
+        seen, correct = before.get(qid, (0, 0))
+        delta = {'question_id': qid, 'seen': (row['seen'] if row else 0) - seen,
+                 'correct': (row['correct'] if row else 0) - correct}
+        if delta['seen'] or delta['correct']:
+            deltas.append(delta)
+    upsert_question_stats(deltas)
+
+
+def rebuild_question_stats():
+    """Recompute QuestionStat from the per-user history table."""
+    QuestionStat.query.delete(synchronize_session=False)
+    db.session.execute(
+        db.insert(QuestionStat).from_select(
+            ['question_id', 'seen', 'correct'],
+            db.select(UserQuestionHistory.question_id,
+                      db.func.sum(UserQuestionHistory.seen),
+                      db.func.sum(UserQuestionHistory.correct))
+            .group_by(UserQuestionHistory.question_id),
+        )
+    )
+
+
+def percent_score(correct, total_questions):
+    """Score as a whole percentage of the attempt's question count."""
+    return int((correct / total_questions) * 100) if total_questions > 0 else 0
+
+
+REGRADE_CHUNK_SIZE = int(os.environ.get("REGRADE_CHUNK_SIZE", "2000"))
+
+
+def regrade_attempts(user_ids=None, chunk_size=REGRADE_CHUNK_SIZE, progress=None):
+    """Re-score completed attempts against the current answer key.
+
+    Attempts are read as plain column tuples in id order, graded with the
+    snapshot's answer-key index and written back with one bulk UPDATE per
+    chunk (only rows whose score or results changed). The affected users'
+    progress aggregates and per-question history are replaced from the same
+    pass, and the global question stats are recomputed. ``progress`` is
+    called with the number of attempts scanned after each chunk.
+    """
+    started = perf_counter()
+    snapshot = get_question_snapshot(force=True)
+    columns = (QuizAttempt.id, QuizAttempt.user_id, QuizAttempt.timestamp, QuizAttempt.total_questions,
+               QuizAttempt.question_ids, QuizAttempt.answers, QuizAttempt.score, QuizAttempt.results_by_category)
+    aggregates = {}  # (user_id, category) -> [correct, total, attempt_count, last_attempt_at]
+    users = set()
+    scanned = changed = 0
+    last_id = 0
+    stale_history = UserQuestionHistory.query
+    if user_ids is not None:
+        stale_history = stale_history.filter(UserQuestionHistory.user_id.in_(user_ids))
+    stale_history.delete(synchronize_session=False)
+    while True:
+        query = db.session.query(*columns).filter(QuizAttempt.is_complete == True, QuizAttempt.id > last_id)
+        if user_ids is not None:
+            query = query.filter(QuizAttempt.user_id.in_(user_ids))
+        rows = query.order_by(QuizAttempt.id).limit(chunk_size).all()
+        if not rows:
+            break
+        updates = []
+        history = {}
+        for attempt_id, user_id, when, total_questions, question_ids, answers, score, old_results in rows:
+            outcomes = []
+            correct, results = snapshot.grade(question_ids, answers, outcomes)
+            _count_outcomes(history, user_id, outcomes, when)
+            new_score = percent_score(correct, total_questions)
+            if new_score != score or results != (old_results or {}):
+                updates.append({'id': attempt_id, 'score': new_score, 'results_by_category': results})
+            users.add(user_id)
+            for category, result in results.items():
+                agg = aggregates.get((user_id, category))
+                if agg is None:
+                    agg = aggregates[(user_id, category)] = [0, 0, 0, None]
+                agg[0] += result['correct']
+                agg[1] += result['total']
+                agg[2] += 1
+                if when and (agg[3] is None or when > agg[3]):
+                    agg[3] = when
+        if updates:
+            db.session.execute(db.update(QuizAttempt), updates)
+        upsert_question_history(list(history.values()))
+        scanned += len(rows)
+        changed += len(updates)
+        last_id = rows[-1][0]
+        if progress:
+            progress(scanned)
+
+    stale = UserCategoryProgress.query
+    if user_ids is not None:
+        stale = stale.filter(UserCategoryProgress.user_id.in_(user_ids))
+    stale.delete(synchronize_session=False)
+    if aggregates:
+        db.session.execute(db.insert(UserCategoryProgress), [
+            {'user_id': user_id, 'category': category, 'correct': agg[0], 'total': agg[1],
+             'attempt_count': agg[2], 'last_attempt_at': agg[3]}
+            for (user_id, category), agg in aggregates.items()
+        ])
+    rebuild_question_stats()
+    db.session.commit()
+    return {
+        'bank_version': snapshot.version,
+        'attempts_scanned': scanned,
+        'attempts_changed': changed,
+        'users': len(users),
+        'elapsed_ms': round((perf_counter() - started) * 1000, 1),
+    }
+
+
+class Job(db.Model):
+    # Background work queued through /api/admin/jobs and run by jobs.JobRunner.
+    __table_args__ = (db.Index('ix_job_status_id', 'status', 'id'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default=jobs.QUEUED)
+    params = db.Column(db.JSON, default=dict, nullable=False)
+    progress = db.Column(db.Float, default=0.0, nullable=False)
+    progress_detail = db.Column(db.String(255), nullable=True)
+    result = db.Column(db.JSON, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_by = db.Column(db.Integer, nullable=True)  # no FK: jobs outlive --reset-all
+    worker = db.Column(db.String(255), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    started_at = db.Column(db.DateTime, nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self, include_result=False):
+        data = {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'params': self.params,
+            'progress': self.progress,
+            'progress_detail': self.progress_detail,
+            'error': self.error,
+            'created_by': self.created_by,
+            'worker': self.worker,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+        if include_result:
+            data['result'] = self.result
+        return data
+
+
+class BankVersion(db.Model):
+    # Single-row stamp bumped whenever the question bank is (re)seeded.
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+def bump_bank_version():
+    """Increment the question bank version inside the current session.
+
+    The caller commits; the new version becomes visible to every process
+    once the transaction lands, and their question caches reload.
+    """
+    row = db.session.get(BankVersion, 1)
+    if row is None:
+        row = BankVersion(id=1, version=0)
+        db.session.add(row)
+    row.version = (row.version or 0) + 1
+    row.updated_at = datetime.utcnow()
+    return row.version
+
+
+# --- Pre-serialized JSON responses ---
+# Large question payloads are stitched together from cached bytes. Optionally
+# compress them: RESPONSE_COMPRESSION = "" (off), "gzip", "br" or "auto"
+# (brotli when installed and accepted, otherwise gzip).
+RESPONSE_COMPRESSION = os.environ.get("RESPONSE_COMPRESSION", "").strip().lower()
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.environ.get("RESPONSE_COMPRESSION_MIN_BYTES", "16384"))
+RESPONSE_COMPRESSION_CACHE_SIZE = int(os.environ.get("RESPONSE_COMPRESSION_CACHE_SIZE", "128"))
+
+_compressed_cache = OrderedDict()  # (encoding, body digest) -> compressed bytes
+_compressed_cache_lock = threading.Lock()
+
+
+def dumps_json(obj) -> bytes:
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+def _negotiate_encoding():
+    if not RESPONSE_COMPRESSION:
+        return None
+    accepted = {
+        part.split(";", 1)[0].strip().lower()
+        for part in request.headers.get("Accept-Encoding", "").split(",")
+    }
+    if RESPONSE_COMPRESSION in ("br", "auto") and brotli is not None and "br" in accepted:
+        return "br"
+    if RESPONSE_COMPRESSION in ("gzip", "auto") and "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    key = (encoding, hashlib.blake2b(body, digest_size=16).digest())
+    with _compressed_cache_lock:
+        cached = _compressed_cache.get(key)
+        if cached is not None:
+            _compressed_cache.move_to_end(key)
+    metrics.cache_result("compressed_response", cached is not None)
+    if cached is not None:
+        return cached
+
+    if encoding == "br":
+        compressed = brotli.compress(body, quality=5)
+    else:
+        compressed = gzip.compress(body, compresslevel=6)
+
+    if RESPONSE_COMPRESSION_CACHE_SIZE > 0:
+        with _compressed_cache_lock:
+            _compressed_cache[key] = compressed
+            _compressed_cache.move_to_end(key)
+            while len(_compressed_cache) > RESPONSE_COMPRESSION_CACHE_SIZE:
+                _compressed_cache.popitem(last=False)
+    return compressed
+
+
+def raw_json_response(body: bytes, status=200):
+    """Wrap already-encoded JSON bytes in a response, compressing if enabled."""
+    resp = make_response(body, status)
+    resp.mimetype = "application/json"
+    if len(body) >= RESPONSE_COMPRESSION_MIN_BYTES:
+        encoding = _negotiate_encoding()
+        if encoding:
+            resp.set_data(_compress(body, encoding))
+            resp.headers["Content-Encoding"] = encoding
+    if RESPONSE_COMPRESSION:
+        resp.vary.add("Accept-Encoding")
+    return resp
+
+
+# --- In-process question bank cache ---
+# The bank only changes when seed.py runs, so every worker keeps an immutable
+# snapshot and re-reads the version stamp at most every few seconds.
+QUESTION_CACHE_CHECK_INTERVAL = float(os.environ.get("QUESTION_CACHE_CHECK_INTERVAL", "5"))
+
+
+class QuestionSnapshot:
+    """Read-only view of the question bank at a single bank version."""
+
+    __slots__ = ("version", "updated_at", "by_id", "json_by_id", "ids", "by_category",
+                 "by_difficulty", "by_bucket", "config_json", "config_etag",
+                 "position", "answer_codes", "key_answers", "category_names", "key_categories")
+
+    def __init__(self, version, questions, updated_at=None):
+        by_category = defaultdict(list)
+        by_difficulty = defaultdict(list)
+        by_bucket = defaultdict(list)
+        by_id = {}
+        json_by_id = {}
+        for q in sorted(questions, key=lambda q: q.id):
+            data = q.to_dict()
+            by_id[q.id] = MappingProxyType(data)
+            json_by_id[q.id] = dumps_json(data)
+            by_category[q.category].append(q.id)
+            by_difficulty[q.difficulty].append(q.id)
+            by_bucket[(q.category, q.difficulty)].append(q.id)
+
+        self.version = version
+        self.by_id = MappingProxyType(by_id)
+        self.json_by_id = MappingProxyType(json_by_id)
+        self.ids = tuple(by_id)
+        self.by_category = MappingProxyType({k: tuple(v) for k, v in by_category.items()})
+        self.by_difficulty = MappingProxyType({k: tuple(v) for k, v in by_difficulty.items()})
+        self.by_bucket = MappingProxyType({k: tuple(v) for k, v in by_bucket.items()})
+        self.updated_at = (updated_at or datetime.utcnow()).replace(microsecond=0)
+        self.config_json = dumps_json(self.facets())
+        self.config_etag = "bank-%d-%s" % (version, hashlib.blake2b(self.config_json, digest_size=8).hexdigest())
+
+        # Answer key aligned to self.ids: one small code per question for the
+        # correct answer and one for its category, so grading never touches
+        # the question dicts.
+        self.position = MappingProxyType({qid: i for i, qid in enumerate(self.ids)})
+        answer_codes = {}
+        category_codes = {}
+        key_answers = array('B')
+        key_categories = array('H')
+        for qid in self.ids:
+            q = by_id[qid]
+            key_answers.append(answer_codes.setdefault(q['correctAnswer'], len(answer_codes) + 1))
+            key_categories.append(category_codes.setdefault(q['category'], len(category_codes)))
+        self.answer_codes = MappingProxyType(answer_codes)
+        self.key_answers = key_answers
+        self.category_names = tuple(category_codes)
+        self.key_categories = key_categories
+
+    def facets(self):
+        """Quiz-config payload: filter values plus question counts per facet."""
+        counts = defaultdict(dict)
+        for (cat, diff), ids in sorted(self.by_bucket.items()):
+            counts[cat][diff] = len(ids)
+        return {
+            'categories': sorted(self.by_category),
+            'difficulties': sorted(self.by_difficulty),
+            'categoryCounts': {k: len(v) for k, v in sorted(self.by_category.items())},
+            'difficultyCounts': {k: len(v) for k, v in sorted(self.by_difficulty.items())},
+            'counts': counts,
+            'total': len(self.ids),
+            'version': self.version,
+        }
+
+    def buckets(self, categories=None, difficulties=None):
+        """(category, difficulty) -> ids pairs matching the filters (empty filter = any)."""
+        cats = set(categories) if categories else None
+        diffs = set(difficulties) if difficulties else None
+        return [
+            (key, ids) for key, ids in self.by_bucket.items()
+            if (cats is None or key[0] in cats) and (diffs is None or key[1] in diffs)
+        ]
+
+    def select(self, categories=None, difficulties=None):
+        """Return ids matching the filters, in id order (empty filter = any)."""
+        if not categories and not difficulties:
+            return list(self.ids)
+        ids = []
+        for _, bucket in self.buckets(categories, difficulties):
+            ids.extend(bucket)
+        ids.sort()
+        return ids
+
+    def sample(self, categories=None, difficulties=None, count=None, quota=None, stratify_by=None):
+        """Random quiz ordering drawn straight from the per-bucket id arrays.
+
+        ``count`` caps the quiz size. ``stratify_by`` ("category" or
+        "difficulty") splits ``count`` across groups in proportion to their
+        size, unless ``quota`` gives an explicit {group: n} allocation.
+        Cost is proportional to the number of questions picked, not the size
+        of the filtered bank.
+        """
+        buckets = self.buckets(categories, difficulties)
+        if not quota and not stratify_by:
+            if count is None:
+                ids = [qid for _, bucket in buckets for qid in bucket]
+                random.shuffle(ids)
+                return ids
+            return _sample_buckets([bucket for _, bucket in buckets], count)
+
+        position = 1 if stratify_by == "difficulty" else 0
+        groups = defaultdict(list)
+        for key, bucket in buckets:
+            groups[key[position]].append(bucket)
+
+        if quota:
+            allocation = {group: quota.get(group, 0) for group in groups}
+        elif count is None:
+            allocation = {group: sum(len(b) for b in group_buckets) for group, group_buckets in groups.items()}
+        else:
+            allocation = _apportion(count, {
+                group: sum(len(b) for b in group_buckets) for group, group_buckets in groups.items()
+            })
+
+        ids = []
+        for group, n in allocation.items():
+            ids.extend(_sample_buckets(groups[group], n))
+        random.shuffle(ids)
+        return ids
+
+    def get(self, question_id):
+        return self.by_id.get(question_id)
+
+    def grade(self, question_ids, answers, outcomes=None):
+        """Score ``answers`` ({question_id_str: answer}) against the answer key.
+
+        Only questions that belong to the attempt (``question_ids``) and still
+        exist in the bank count. Returns (correct, results_by_category); if
+        ``outcomes`` is a list, (question_id, is_correct) pairs are appended.
+        """
+        position = self.position
+        codes = self.answer_codes
+        key_answers = self.key_answers
+        key_categories = self.key_categories
+        allowed = set(question_ids or ())
+        totals = Counter()
+        correct = Counter()
+        for qid_str, answer in (answers or {}).items():
+            try:
+                qid = int(qid_str)
+            except (TypeError, ValueError):
+                continue
+            i = position.get(qid) if qid in allowed else None
+            if i is None:
+                continue
+            category = key_categories[i]
+            totals[category] += 1
+            ok = isinstance(answer, str) and codes.get(answer) == key_answers[i]
+            if ok:
+                correct[category] += 1
+            if outcomes is not None:
+                outcomes.append((qid, ok))
+        names = self.category_names
+        results = {
+            names[c]: {'correct': correct[c], 'total': n} for c, n in totals.items()
+        }
+        return sum(correct.values()), results
+
+    def json_array(self, question_ids):
+        """Encoded JSON array of the questions in ``question_ids`` order.
+
+        Each question was encoded once when the snapshot was built, so this
+        is only a join over cached byte strings.
+        """
+        encoded = self.json_by_id
+        return b"[" + b",".join(encoded[qid] for qid in question_ids if qid in encoded) + b"]"
+
+
+def _sample_buckets(buckets, k):
+    """Pick ``k`` distinct ids uniformly across ``buckets`` without concatenating them."""
+    bounds = list(accumulate(len(b) for b in buckets))
+    total = bounds[-1] if bounds else 0
+    picked = []
+    for index in random.sample(range(total), min(max(k, 0), total)):
+        i = bisect_right(bounds, index)
+        picked.append(buckets[i][index - (bounds[i - 1] if i else 0)])
+    return picked
+
+
+def _apportion(count, sizes):
+    """Split ``count`` across groups proportionally to ``sizes`` (largest remainder)."""
+    total = sum(sizes.values())
+    count = min(count, total)
+    if total == 0:
+        return {group: 0 for group in sizes}
+    exact = {group: count * size / total for group, size in sizes.items()}
+    allocation = {group: int(share) for group, share in exact.items()}
+    leftover = count - sum(allocation.values())
+    for group in sorted(exact, key=lambda g: exact[g] - allocation[g], reverse=True)[:leftover]:
+        allocation[group] += 1
+    return allocation
+
+
+_question_cache_lock = threading.Lock()
+_question_snapshot = None
+_question_snapshot_checked = 0.0
+
+
+def _bank_stamp():
+    row = db.session.get(BankVersion, 1)
+    return (row.version, row.updated_at) if row else (0, None)
+
+
+def get_question_snapshot(force=False):
+    """Return the cached snapshot, reloading it if the bank version moved."""
+    global _question_snapshot, _question_snapshot_checked
+
+    snapshot = _question_snapshot
+    now = time()
+    if not force and snapshot is not None and now - _question_snapshot_checked < QUESTION_CACHE_CHECK_INTERVAL:
+        metrics.cache_result("question_snapshot", True)
+        return snapshot
+
+    with _question_cache_lock:
+        snapshot = _question_snapshot
+        if not force and snapshot is not None and now - _question_snapshot_checked < QUESTION_CACHE_CHECK_INTERVAL:
+            return snapshot
+        version, updated_at = _bank_stamp()
+        rebuild = force or snapshot is None or snapshot.version != version
+        metrics.cache_result("question_snapshot", not rebuild)
+        if rebuild:
+            snapshot = QuestionSnapshot(version, Question.query.all(), updated_at)
+            _question_snapshot = snapshot
+        _question_snapshot_checked = now
+        return snapshot
+
+
+def invalidate_question_cache():
+    global _question_snapshot
+    with _question_cache_lock:
+        _question_snapshot = None
+
+# --- Adaptive question selection ---
+# mode="adaptive" quizzes lean toward the user's weak categories and toward
+# questions they missed or have never seen. Global p-correct per question is
+# kept as an array aligned to the snapshot ids and refreshed every
+# QUESTION_STATS_TTL seconds; the user's own history is one primary-key range
+# read. Candidates are drawn from the snapshot's bucket arrays, so the cost
+# scales with the quiz size and the user's history, not the bank size.
+ADAPTIVE_QUIZ_SIZE = int(os.environ.get("ADAPTIVE_QUIZ_SIZE", "20"))
+ADAPTIVE_REVIEW_SHARE = float(os.environ.get("ADAPTIVE_REVIEW_SHARE", "0.3"))
+QUESTION_STATS_TTL = float(os.environ.get("QUESTION_STATS_TTL", "300"))
+
+_question_stats_lock = threading.Lock()
+_question_stats = None  # (bank version, loaded at, array of p-correct aligned to snapshot.ids)
+
+
+def question_p_correct(snapshot):
+    """Smoothed global p-correct per question, aligned to ``snapshot.ids``."""
+    global _question_stats
+    cached = _question_stats
+    now = time()
+    if cached is not None and cached[0] == snapshot.version and now - cached[1] < QUESTION_STATS_TTL:
+        metrics.cache_result("question_stats", True)
+        return cached[2]
+    with _question_stats_lock:
+        cached = _question_stats
+        if cached is not None and cached[0] == snapshot.version and now - cached[1] < QUESTION_STATS_TTL:
+            return cached[2]
+        metrics.cache_result("question_stats", False)
+        p_correct = array('f', [0.5]) * len(snapshot.ids)
+        position = snapshot.position
+        for qid, seen, correct in db.session.query(QuestionStat.question_id, QuestionStat.seen, QuestionStat.correct):
+            i = position.get(qid)
+            if i is not None:
+                p_correct[i] = (correct + 1) / (seen + 2)
+        _question_stats = (snapshot.version, now, p_correct)
+        return p_correct
+
+
+def _weighted_pick(candidates, weights, k):
+    """``k`` distinct candidates, weighted random without replacement."""
+    if k >= len(candidates):
+        return list(candidates)
+    keyed = sorted(((random.random() ** (1.0 / w), c) for c, w in zip(candidates, weights)), reverse=True)
+    return [c for _, c in keyed[:k]]
+
+
+def _sample_unseen(buckets, size, k, seen, seen_here):
+    """Up to ``k`` random ids from ``buckets`` that are not in ``seen``.
+
+    Rejection-samples while most of the pool is unseen; otherwise filters it.
+    """
+    unseen_fraction = 1 - seen_here / size if size else 0
+    if unseen_fraction >= 0.5:
+        draws = _sample_buckets(buckets, min(size, int(k / unseen_fraction * 1.2) + 8))
+        unseen = [qid for qid in draws if qid not in seen]
+        if len(unseen) >= k or len(draws) == size:
+            return unseen[:k]
+    pool = [qid for bucket in buckets for qid in bucket if qid not in seen]
+    return random.sample(pool, min(k, len(pool)))
+
+
+def select_adaptive(snapshot, user_id, categories=None, difficulties=None, count=ADAPTIVE_QUIZ_SIZE):
+    """Pick ``count`` question ids for ``user_id`` within the filters."""
+    groups = defaultdict(list)
+    for (category, _), bucket in snapshot.buckets(categories, difficulties):
+        groups[category].append(bucket)
+    if not groups:
+        return []
+    sizes = {category: sum(len(b) for b in buckets) for category, buckets in groups.items()}
+
+    # Weak categories get a larger share: weight = 1 - smoothed accuracy.
+    accuracy = {
+        category: (correct + 1) / (total + 2)
+        for category, correct, total in db.session.query(
+            UserCategoryProgress.category, UserCategoryProgress.correct, UserCategoryProgress.total
+        ).filter(UserCategoryProgress.user_id == user_id, UserCategoryProgress.category.in_(list(groups)))
+    }
+    weights = {category: 1.05 - accuracy.get(category, 0.5) for category in groups}
+    allocation = _apportion(count, {category: int(w * 1000) for category, w in weights.items()})
+    spare = 0
+    for category in allocation:
+        if allocation[category] > sizes[category]:
+            spare += allocation[category] - sizes[category]
+            allocation[category] = sizes[category]
+    for category in sorted(groups, key=lambda c: weights[c], reverse=True):
+        extra = min(spare, sizes[category] - allocation[category])
+        allocation[category] += extra
+        spare -= extra
+
+    # The user's history, split into missed and answered-correctly pools.
+    diff_filter = set(difficulties) if difficulties else None
+    by_id = snapshot.by_id
+    seen = set()
+    missed = defaultdict(list)
+    mastered = defaultdict(list)
+    history = db.session.query(
+        UserQuestionHistory.question_id, UserQuestionHistory.last_correct, UserQuestionHistory.last_seen_at
+    ).filter(UserQuestionHistory.user_id == user_id)
+    for qid, last_correct, last_seen_at in history:
+        seen.add(qid)
+        question = by_id.get(qid)
+        if question is None or question['category'] not in allocation:
+            continue
+        if diff_filter is not None and question['difficulty'] not in diff_filter:
+            continue
+        (mastered if last_correct else missed)[question['category']].append((last_seen_at or datetime.min, qid))
+
+    p_correct = question_p_correct(snapshot)
+    position = snapshot.position
+    picked = []
+    for category, n in allocation.items():
+        if n <= 0:
+            continue
+        review = [qid for _, qid in sorted(missed[category])]  # oldest misses first
+        take = review[:min(len(review), max(int(round(n * ADAPTIVE_REVIEW_SHARE)), 0))]
+
+        # Unseen questions near the user's level in this category: draw an
+        # oversample from the bucket arrays, then weight by how close each
+        # question's global p-correct is to the user's accuracy.
+        want = n - len(take)
+        if want > 0:
+            seen_here = len(missed[category]) + len(mastered[category])
+            unseen = _sample_unseen(groups[category], sizes[category], 3 * want, seen, seen_here)
+            target = accuracy.get(category, 0.5)
+            take += _weighted_pick(unseen, [1.05 - abs(p_correct[position[qid]] - target) for qid in unseen], want)
+
+        # Not enough unseen questions: more misses, then the least recently
+        # seen questions the user already got right.
+        if len(take) < n:
+            chosen = set(take)
+            rest = [qid for qid in review if qid not in chosen]
+            rest += [qid for _, qid in sorted(mastered[category])]
+            take += rest[:n - len(take)]
+        picked.extend(take)
+
+    random.shuffle(picked)
+    return picked
+
+
+# --- Token and identity caches ---
+# Verifying a JWT and loading its user on every request doubles the work of
+# hot endpoints, so both are cached briefly. Cached tokens never outlive
+# their own expiry; identities expire after USER_CACHE_TTL and are dropped
+# immediately when a User row changes in this process.
+TOKEN_CACHE_SIZE = int(os.environ.get("TOKEN_CACHE_SIZE", "4096"))
+TOKEN_CACHE_TTL = float(os.environ.get("TOKEN_CACHE_TTL", "300"))
+USER_CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", "4096"))
+USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", "60"))
+JWT_LEEWAY = 30  # small clock skew allowance around expiry
+
+UserIdentity = namedtuple("UserIdentity", ["id", "username", "is_admin"])
+
+
+class TTLCache:
+    """Thread-safe LRU mapping whose entries also expire after a TTL."""
+
+    def __init__(self, maxsize, name=None):
+        self.maxsize = maxsize
+        self.name = name  # reported in cache hit/miss metrics when set
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] <= time():
+                del self._data[key]
+                entry = None
+            if entry is not None:
+                self._data.move_to_end(key)
+        if self.name:
+            metrics.cache_result(self.name, entry is not None)
+        return default if entry is None else entry[1]
+
+    def set(self, key, value, ttl):
+        if self.maxsize <= 0 or ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+_token_cache = TTLCache(TOKEN_CACHE_SIZE, name="token")
+_user_cache = TTLCache(USER_CACHE_SIZE, name="user")
+
+
+def decode_token(token):
+    """Verify ``token`` and return its claims, raising jwt errors on failure."""
+    key = hashlib.sha256(token.encode("utf-8")).digest()
+    payload = _token_cache.get(key)
+    if payload is not None:
+        return payload
+    payload = jwt.decode(
+        token,
+        app.config["SECRET_KEY"],
+        algorithms=["HS256"],
+        options={"require": ["exp"]},
+        leeway=JWT_LEEWAY,
+    )
+    _token_cache.set(key, payload, min(TOKEN_CACHE_TTL, payload["exp"] + JWT_LEEWAY - time()))
+    return payload
+
+
+def load_identity(user_id):
+    """Cached (id, username, is_admin) for ``user_id``, or None if no such user."""
+    identity = _user_cache.get(user_id)
+    if identity is None:
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        identity = UserIdentity(user.id, user.username, user.is_admin)
+        _user_cache.set(user_id, identity, USER_CACHE_TTL)
+    return identity
+
+
+def invalidate_user_identity(user_id=None):
+    if user_id is None:
+        _user_cache.clear()
+    else:
+        _user_cache.pop(user_id)
+
+
+@db.event.listens_for(User, "after_update")
+@db.event.listens_for(User, "after_delete")
+def _drop_cached_identity(mapper, connection, target):
+    invalidate_user_identity(target.id)
+
+
+def _bearer_token():
+    # Read token from Authorization: Bearer <token>
+    auth = request.headers.get("Authorization", "")
+    if auth.startswith("Bearer "):
+        return auth.split(" ", 1)[1].strip() or None
+    return None
+
 # --- Decorators ---
 
-def token_required(f):
+def token_required(f=None, *, claims_only=False):
+    """Require a valid bearer token and pass the caller's identity to the view.
+
+    Views that only need the token's claims (user id and admin flag) can use
+    ``@token_required(claims_only=True)`` to skip the user lookup entirely.
+    """
+    if f is None:
+        return lambda view: token_required(view, claims_only=claims_only)
+
     @wraps(f)
     def decorated(*args, **kwargs):
-        # Read token from Authorization: Bearer <token>
-        auth = request.headers.get("Authorization", "")
-        token = None
-        if auth.startswith("Bearer "):
-            token = auth.split(" ", 1)[1].strip()
-
+        token = _bearer_token()
         if not token:
             return jsonify({"message": "Authorization token is missing"}), 401
 
         try:
-            # Allow small clock skew (30s) to avoid edge cases around expiry
-            payload = jwt.decode(
-                token,
-                app.config["SECRET_KEY"],
-                algorithms=["HS256"],
-                options={"require": ["exp"]},
-                leeway=30,
-            )
+            payload = decode_token(token)
             user_id = payload.get("user_id")
             if not user_id:
                 return jsonify({"message": "Invalid token payload"}), 401
 
-            current_user = User.query.get(user_id)
-            if not current_user:
-                return jsonify({"message": "User not found"}), 401
+            if claims_only:
+                current_user = UserIdentity(user_id, None, bool(payload.get("is_admin", False)))
+            else:
+                current_user = load_identity(user_id)
+                if not current_user:
+                    return jsonify({"message": "User not found"}), 401
 
         except jwt.ExpiredSignatureError:
             return jsonify({"message": "Token expired"}), 401
@@ -195,24 +1287,15 @@ def admin_required(f):
     @wraps(f)
     def wrapper(*args, **kwargs):
         # First, require a valid user token
-        auth = request.headers.get("Authorization", "")
-        token = None
-        if auth.startswith("Bearer "):
-            token = auth.split(" ", 1)[1].strip()
+        token = _bearer_token()
         if not token:
             return jsonify({"message": "Authorization token is missing"}), 401
 
         try:
-            payload = jwt.decode(
-                token,
-                app.config["SECRET_KEY"],
-                algorithms=["HS256"],
-                options={"require": ["exp"]},
-                leeway=30,
-            )
+            payload = decode_token(token)
             user_id = payload.get("user_id")
             is_admin_flag = payload.get("is_admin", False)
-            current_user = User.query.get(user_id)
+            current_user = load_identity(user_id) if user_id else None
             if not current_user:
                 return jsonify({"message": "User not found"}), 401
         except jwt.ExpiredSignatureError:
@@ -221,7 +1304,7 @@ def admin_required(f):
             return jsonify({"message": "Token invalid"}), 401
 
         # If the user has admin role, allow immediately
-        if getattr(current_user, "is_admin", False) or is_admin_flag:
+        if current_user.is_admin or is_admin_flag:
             return f(current_user, *args, **kwargs)
 
         # Otherwise, check the short-lived admin cookie from the passcode gate
@@ -230,13 +1313,7 @@ def admin_required(f):
             return jsonify({"message": "Admin privileges required"}), 403
 
         try:
-            jwt.decode(
-                admin_access_token,
-                app.config["SECRET_KEY"],
-                algorithms=["HS256"],
-                options={"require": ["exp"]},
-                leeway=30,
-            )
+            decode_token(admin_access_token)
         except jwt.ExpiredSignatureError:
             return jsonify({"message": "Admin access expired"}), 403
         except jwt.InvalidTokenError:
@@ -246,6 +1323,75 @@ def admin_required(f):
 
     return wrapper
 
+# --- HTTP caching ---
+# Strong ETags and Cache-Control for read-only endpoints. Views whose output
+# is a pure function of a cheap data version (e.g. the question bank version)
+# pass ``version=`` so a matching If-None-Match is answered with 304 before
+# the view runs, and can opt into a bounded server-side response cache.
+# Other views get an ETag computed from their body after the fact.
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", "256"))
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", "300"))
+_response_cache = TTLCache(RESPONSE_CACHE_SIZE, name="response")
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _apply_cache_control(resp, scope, max_age):
+    if scope == "public":
+        resp.cache_control.public = True
+        resp.cache_control.max_age = max_age
+    else:
+        # Per-user data: browsers may keep it but must revalidate, proxies must not share it
+        resp.cache_control.private = True
+        resp.cache_control.no_cache = True
+        resp.vary.add("Authorization")
+
+
+def http_cached(scope="private", max_age=0, version=None, server_cache=False):
+    """Add ETag/Cache-Control to a GET view and answer If-None-Match with 304.
+
+    ``version`` is a zero-argument callable returning a key that changes
+    whenever the response would. ``server_cache`` (public views with a
+    ``version`` only) keeps recent bodies in memory keyed by that ETag.
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            etag = None
+            if version is not None:
+                etag = _digest("\x1f".join((
+                    request.path, request.query_string.decode("latin-1"),
+                    str(version()), _negotiate_encoding() or "",
+                )).encode("utf-8"))
+                if request.if_none_match.contains(etag):
+                    resp = make_response("", 304)
+                    resp.set_etag(etag)
+                    _apply_cache_control(resp, scope, max_age)
+                    return resp
+                if server_cache:
+                    cached = _response_cache.get(etag)
+                    if cached is not None:
+                        body, headers = cached
+                        return Response(body, 200, headers=headers)
+
+            resp = make_response(f(*args, **kwargs))
+            if resp.status_code != 200 or resp.is_streamed:
+                return resp
+            resp.set_etag(etag or _digest(resp.get_data()))
+            _apply_cache_control(resp, scope, max_age)
+            if etag and server_cache and scope == "public":
+                _response_cache.set(etag, (resp.get_data(), list(resp.headers.items())), RESPONSE_CACHE_TTL)
+            return resp.make_conditional(request)
+        return wrapper
+    return decorator
+
+
+def _bank_version_key():
+    return get_question_snapshot().version
+
+
 # --- API Endpoints ---
 
 # --- Minimal security headers for every response ---
@@ -259,6 +1405,74 @@ def set_security_headers(resp):
     return resp
 
 
+# --- Request instrumentation ---
+# Per-route latency, response size and SQL statement counts/time, exposed at
+# /api/metrics to admins or to scrapers presenting METRICS_TOKEN as a bearer
+# token. SLOW_REQUEST_MS > 0 also logs slow requests with their queries.
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", "0"))
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+metrics.registry.register(metrics.Gauges(
+    "db_pool", "SQLAlchemy connection pool statistics.",
+    lambda: dbpool.pool_stats.snapshot(db.engine.pool),
+))
+
+
+def instrument_sql(engine):
+    @db.event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(perf_counter())
+
+    @db.event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = perf_counter() - conn.info["query_started"].pop()
+        metrics.sql_query_duration.observe(elapsed, statement.lstrip().split(" ", 1)[0].upper())
+        if has_request_context() and "sql_count" in g:
+            g.sql_count += 1
+            g.sql_time += elapsed
+            if g.sql_log is not None:
+                g.sql_log.append((round(elapsed * 1000, 2), " ".join(statement.split())[:300]))
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = perf_counter()
+    g.sql_count = 0
+    g.sql_time = 0.0
+    g.sql_log = [] if SLOW_REQUEST_MS > 0 else None
+
+
+@app.after_request
+def record_request_metrics(resp):
+    started = g.get("request_started")
+    if started is None:
+        return resp
+    elapsed = perf_counter() - started
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    metrics.http_requests.inc(route, request.method, str(resp.status_code))
+    metrics.http_latency.observe(elapsed, route, request.method)
+    metrics.sql_queries_per_request.observe(g.sql_count, route)
+    metrics.sql_time_per_request.observe(g.sql_time, route)
+    if not resp.is_streamed and resp.content_length is not None:
+        metrics.http_response_bytes.observe(resp.content_length, route)
+    if SLOW_REQUEST_MS > 0 and elapsed * 1000 >= SLOW_REQUEST_MS:
+        metrics.slow_requests.inc(route)
+        app.logger.warning(
+            "Slow request %s %s: %.1f ms, %d queries (%.1f ms)\n%s",
+            request.method, request.path, elapsed * 1000, g.sql_count, g.sql_time * 1000,
+            "\n".join(f"  {ms} ms  {sql}" for ms, sql in g.sql_log),
+        )
+    return resp
+
+
+@app.errorhandler(PasswordHasherBusy)
+def password_hasher_busy(_error):
+    # Shed load quickly instead of queueing logins behind the bcrypt pool
+    resp = jsonify({'message': 'Server is busy, please try again shortly'})
+    resp.headers['Retry-After'] = '1'
+    return resp, 503
+
+
 @app.route('/api/register', methods=['POST'])
 def register_user():
     data = request.get_json() or {}
@@ -320,6 +1534,11 @@ def verify_and_get_token():
     if not user or not user.check_password(password):
         return jsonify({"message": "Invalid username or password"}), 401
 
+    # Transparently move old hashes to the configured cost factor
+    if passwords.needs_rehash(user.password_hash):
+        user.set_password(password)
+        db.session.commit()
+
     token = jwt.encode({
         'user_id': user.id,
         'is_admin': user.is_admin,
@@ -337,19 +1556,47 @@ def verify_and_get_token():
 # UPDATED: This endpoint now shuffles the questions before creating the attempt.
 @app.route('/api/quiz/start', methods=['POST'])
 @token_required
+@user_rate_limited(quiz_start_limiter)
 def start_quiz(current_user):
     data = request.get_json() or {}
     cats = data.get('categories', [])
     diffs = data.get('difficulties', [])
-    q = Question.query
-    if cats: q = q.filter(Question.category.in_(cats))
-    if diffs: q = q.filter(Question.difficulty.in_(diffs))
-    selected = q.all()
-    
-    # NEW: Shuffle the selected questions randomly.
-    random.shuffle(selected)
-    
-    ids = [q.id for q in selected]
+
+    # Optional size cap and stratification, e.g. a 100-question DECA exam
+    # with {"quota": {"Finance": 25, ...}} (which sets the size itself) or
+    # {"questionCount": 100, "stratifyBy": "category"}.
+    count = data.get('questionCount')
+    if count is not None and (not isinstance(count, int) or isinstance(count, bool) or count < 1):
+        return jsonify({'message': 'questionCount must be a positive integer'}), 400
+    stratify_by = data.get('stratifyBy')
+    if stratify_by not in (None, 'category', 'difficulty'):
+        return jsonify({'message': "stratifyBy must be 'category' or 'difficulty'"}), 400
+    quota = data.get('quota')
+    if quota is not None and (
+        not isinstance(quota, dict)
+        or not all(isinstance(n, int) and not isinstance(n, bool) and n >= 0 for n in quota.values())
+    ):
+        return jsonify({'message': 'quota must map group names to non-negative integers'}), 400
+    if quota and count is not None:
+        # The quota already fixes the quiz size; a second, conflicting size
+        # would be silently ignored
+        return jsonify({'message': 'use either quota or questionCount, not both'}), 400
+
+    # mode="adaptive" builds a fixed-size quiz from the user's history
+    # (questionCount defaults to ADAPTIVE_QUIZ_SIZE).
+    mode = data.get('mode', 'random')
+    if mode not in ('random', 'adaptive'):
+        return jsonify({'message': "mode must be 'random' or 'adaptive'"}), 400
+    if mode == 'adaptive' and (quota or stratify_by):
+        return jsonify({'message': 'quota and stratifyBy are not supported in adaptive mode'}), 400
+
+    snapshot = get_question_snapshot()
+    if mode == 'adaptive':
+        ids = select_adaptive(snapshot, current_user.id, cats, diffs, count or ADAPTIVE_QUIZ_SIZE)
+    else:
+        # Random draw from the cached bank (capped, stratified or by quota), already shuffled
+        ids = snapshot.sample(cats, diffs, count=count, quota=quota, stratify_by=stratify_by)
+
     new_attempt = QuizAttempt(
         test_name=data.get('testName', 'Practice Quiz'),
         total_questions=len(ids),
@@ -360,86 +1607,122 @@ def start_quiz(current_user):
     )
     db.session.add(new_attempt)
     db.session.commit()
-    return jsonify({
-        'attemptId': new_attempt.id,
-        'questions': [q.to_dict() for q in selected]
-    }), 200
+    # Lightweight mode: hand back only the ordering; the client pages the
+    # questions in through /api/quiz/questions/<attempt_id>.
+    if data.get('includeQuestions', True) is False:
+        return jsonify({
+            'attemptId': new_attempt.id,
+            'questionIds': ids,
+            'totalQuestions': len(ids)
+        }), 200
+
+    body = (
+        b'{"attemptId":' + dumps_json(new_attempt.id)
+        + b',"questions":' + snapshot.json_array(ids) + b'}'
+    )
+    return raw_json_response(body, 200)
 
 @app.route('/api/quiz/submit', methods=['POST'])
 @token_required
 def submit_quiz(current_user):
     data = request.get_json() or {}
     attempt_id = data.get('attemptId')
-    score = data.get('score')
 
-    if attempt_id is None or score is None:
-        return jsonify({'message': 'attemptId and score required'}), 400
+    # The score is always computed here; a client-sent 'score' is ignored.
+    if attempt_id is None:
+        return jsonify({'message': 'attemptId required'}), 400
 
     attempt = QuizAttempt.query.filter_by(id=attempt_id, user_id=current_user.id).first()
     if not attempt:
         return jsonify({'message': 'Attempt not found'}), 404
-
-    questions = Question.query.filter(Question.id.in_(attempt.question_ids)).all()
-    question_map = {q.id: q for q in questions}
-    results = {}
-    for q_id_str, user_answer in attempt.answers.items():
-        q_id = int(q_id_str)
-        if q_id in question_map:
-            question = question_map[q_id]
-            category = question.category
-            if category not in results:
-                results[category] = {'correct': 0, 'total': 0}
-            
-            results[category]['total'] += 1
-            if user_answer == question.correctAnswer:
-                results[category]['correct'] += 1
-    
-    attempt.results_by_category = results
-
-    # Calculate score server-side based on the results
-    total_correct = sum(r['correct'] for r in results.values())
-    # You can calculate percentage based on the total questions in the attempt
-    # or just the questions processed. Using attempt.total_questions is safer.
-    if attempt.total_questions > 0:
-        calculated_score = int((total_correct / attempt.total_questions) * 100)
+    fold_pending_answers(attempt)
+    purge_pending_answers(attempt.id)
+
+    outcomes = []
+    total_correct, results = get_question_snapshot().grade(attempt.question_ids, attempt.answers, outcomes)
+
+    # Keep the per-user aggregates and question history in step, in the
+    # same transaction. A resubmission backs out what the attempt counted
+    # before, so the totals match what regrade_attempts would rebuild.
+    resubmitted = attempt.is_complete
+    if resubmitted:
+        apply_progress(current_user.id, attempt.results_by_category, attempt.timestamp, sign=-1)
     else:
-        calculated_score = 0
-
-    attempt.score = calculated_score
+        record_question_outcomes(current_user.id, outcomes, attempt.timestamp)
+    apply_progress(current_user.id, results, attempt.timestamp)
+    attempt.results_by_category = results
+    attempt.score = percent_score(total_correct, attempt.total_questions)
     attempt.is_complete = True
+    if resubmitted:
+        db.session.flush()
+        rebuild_question_history(current_user.id, attempt.question_ids)
     db.session.commit()
 
     return jsonify({'message': 'Quiz submitted', 'attempt': attempt.to_dict()}), 200
 
 @app.route('/api/user/progress', methods=['GET'])
 @token_required
+@http_cached()
 def get_user_progress(current_user):
-    attempts = QuizAttempt.query.filter_by(user_id=current_user.id, is_complete=True).order_by(QuizAttempt.timestamp.asc()).all()
-    
+    rows = UserCategoryProgress.query.filter_by(user_id=current_user.id).all()
+    if not rows and QuizAttempt.query.filter_by(user_id=current_user.id, is_complete=True).first():
+        # History predates the aggregate table; build it once.
+        rebuild_user_progress(current_user.id)
+        db.session.commit()
+        rows = UserCategoryProgress.query.filter_by(user_id=current_user.id).all()
+
+    overall_performance = {
+        row.category: {
+            'correct': row.correct,
+            'total': row.total,
+            'attempt_count': row.attempt_count,
+            'last_attempt': row.last_attempt_at.isoformat() if row.last_attempt_at else None,
+        }
+        for row in rows if row.attempt_count > 0
+    }
+
+    # Chart series. ?series=false skips it; ?limit=N returns only the N most
+    # recent attempts and ?before=<timestamp> pages further back.
+    if request.args.get('series', 'true').lower() == 'false':
+        return jsonify({'progress_data': [], 'overall_performance': overall_performance}), 200
+
+    series = (
+        db.session.query(QuizAttempt.timestamp, QuizAttempt.test_name, QuizAttempt.results_by_category)
+        .filter(QuizAttempt.user_id == current_user.id, QuizAttempt.is_complete == True)
+    )
+    before = request.args.get('before')
+    if before:
+        try:
+            series = series.filter(QuizAttempt.timestamp < datetime.fromisoformat(before))
+        except ValueError:
+            return jsonify({'message': 'before must be an ISO timestamp'}), 400
+    limit = request.args.get('limit', type=int)
+    if limit and limit > 0:
+        attempts = series.order_by(QuizAttempt.timestamp.desc()).limit(limit + 1).all()
+        has_more = len(attempts) > limit
+        attempts = list(reversed(attempts[:limit]))
+    else:
+        attempts = series.order_by(QuizAttempt.timestamp.asc()).all()
+        has_more = False
+
     progress_data = []
-    overall_performance = {}
-
-    for attempt in attempts:
-        if attempt.results_by_category:
-            for category, result in attempt.results_by_category.items():
-                score = (result['correct'] / result['total']) * 100 if result['total'] > 0 else 0
-                
-                progress_data.append({
-                    'timestamp': attempt.timestamp.isoformat(),
-                    'test_name': attempt.test_name,
-                    'category': category,
-                    'score': score
-                })
-
-                if category not in overall_performance:
-                    overall_performance[category] = {'correct': 0, 'total': 0}
-                overall_performance[category]['correct'] += result['correct']
-                overall_performance[category]['total'] += result['total']
+    for timestamp, test_name, results in attempts:
+        for category, result in (results or {}).items():
+            score = (result['correct'] / result['total']) * 100 if result['total'] > 0 else 0
+            progress_data.append({
+                'timestamp': timestamp.isoformat(),
+                'test_name': test_name,
+                'category': category,
+                'score': score
+            })
 
-    return jsonify({
+    response = {
         'progress_data': progress_data,
         'overall_performance': overall_performance
-    }), 200
+    }
+    if has_more:
+        response['next_before'] = attempts[0][0].isoformat()
+    return jsonify(response), 200
 
 
 # --- ADMIN ENDPOINTS ---
@@ -484,123 +1767,872 @@ def get_all_users(current_user):
         'is_admin': u.is_admin
     } for u in users]), 200
 
+def admin_analytics(sort='id', order='asc', limit=None, offset=0):
+    """Site-wide analytics payload; raises ValueError for an unknown ``sort``."""
+    ensure_progress_backfilled()
+
+    total_quizzes, avg_score = (
+        db.session.query(db.func.count(QuizAttempt.id), db.func.avg(QuizAttempt.score))
+        .filter(QuizAttempt.is_complete == True)
+        .one()
+    )
+
+    # Category totals come from the rollup that submit_quiz maintains.
+    category_rows = (
+        db.session.query(
+            UserCategoryProgress.category,
+            db.func.sum(UserCategoryProgress.correct),
+            db.func.sum(UserCategoryProgress.total),
+        )
+        .group_by(UserCategoryProgress.category)
+        .all()
+    )
+    performance_by_category = {
+        category: {'correct': int(correct or 0), 'total': int(total or 0)}
+        for category, correct, total in category_rows
+    }
+
+    # Per-user stats as one grouped query. Optional ?sort=username|quiz_count|
+    # average_score, ?order=asc|desc and ?limit=/?offset= pagination.
+    quiz_count = db.func.count(QuizAttempt.id)
+    average_score = db.func.sum(db.func.coalesce(QuizAttempt.score, 0)) * 1.0 / quiz_count
+    user_query = (
+        db.session.query(User.id, User.username, quiz_count.label('quiz_count'), average_score.label('average_score'))
+        .join(QuizAttempt, QuizAttempt.user_id == User.id)
+        .filter(QuizAttempt.is_complete == True)
+        .group_by(User.id, User.username)
+    )
+    sort_columns = {'id': User.id, 'username': User.username, 'quiz_count': quiz_count, 'average_score': average_score}
+    if sort not in sort_columns:
+        raise ValueError('sort must be one of: ' + ', '.join(sort_columns))
+    sort_column = sort_columns[sort]
+    if (order or 'asc').lower() == 'desc':
+        user_query = user_query.order_by(sort_column.desc(), User.id)
+    else:
+        user_query = user_query.order_by(sort_column.asc(), User.id)
+
+    active_users = (
+        db.session.query(db.func.count(db.distinct(QuizAttempt.user_id)))
+        .filter(QuizAttempt.is_complete == True)
+        .scalar()
+    )
+    if limit is not None:
+        user_query = user_query.limit(max(limit, 0)).offset(max(offset or 0, 0))
+
+    user_analytics = [{
+        'id': user_id,
+        'username': username,
+        'quiz_count': count,
+        'average_score': float(avg) if avg is not None else 0.0
+    } for user_id, username, count, avg in user_query.all()]
+
+    return {
+        'total_quizzes_taken': total_quizzes,
+        'average_score_all_users': float(avg_score) if avg_score is not None else None,
+        'performance_by_category': performance_by_category,
+        'user_analytics': user_analytics,
+        'active_users': active_users
+    }
+
+
 @app.route('/api/admin/analytics', methods=['GET'])
 @admin_required
 def get_admin_analytics(current_user):
-    all_attempts = QuizAttempt.query.filter_by(is_complete=True).all()
-    
-    total_quizzes = len(all_attempts)
-    avg_score = db.session.query(db.func.avg(QuizAttempt.score)).filter(QuizAttempt.is_complete==True).scalar()
-
-    performance_by_category = {}
-    for attempt in all_attempts:
-        if attempt.results_by_category:
-            for category, result in attempt.results_by_category.items():
-                if category not in performance_by_category:
-                    performance_by_category[category] = {'correct': 0, 'total': 0}
-                performance_by_category[category]['correct'] += result['correct']
-                performance_by_category[category]['total'] += result['total']
-    
-    users = User.query.all()
-    user_analytics = []
-    for user in users:
-        user_attempts = [a for a in all_attempts if a.user_id == user.id]
-        if user_attempts:
-            user_avg_score = sum(a.score for a in user_attempts if a.score is not None) / len(user_attempts)
-            user_analytics.append({
-                'id': user.id,
-                'username': user.username,
-                'quiz_count': len(user_attempts),
-                'average_score': user_avg_score
-            })
+    try:
+        payload = admin_analytics(
+            sort=request.args.get('sort', 'id'),
+            order=request.args.get('order', 'asc'),
+            limit=request.args.get('limit', type=int),
+            offset=request.args.get('offset', 0, type=int),
+        )
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    return jsonify(payload), 200
+
+@app.route('/api/admin/regrade', methods=['POST'])
+@admin_required
+def regrade(current_user):
+    """Re-score historical attempts after an answer-key fix.
+
+    Optional body: {"userIds": [...]} to limit the regrade to some users.
+    Queues a "regrade" job and returns 202 with it; poll the Location URL.
+    """
+    data = request.get_json(silent=True) or {}
+    user_ids = data.get('userIds')
+    if user_ids is not None and (
+        not isinstance(user_ids, list) or not all(isinstance(u, int) and not isinstance(u, bool) for u in user_ids)
+    ):
+        return jsonify({'message': 'userIds must be a list of integers'}), 400
+    params = {} if user_ids is None else {'userIds': user_ids}
+    job = job_runner.submit('regrade', params, created_by=current_user.id)
+    resp = jsonify(job.to_dict())
+    resp.headers['Location'] = f"/api/admin/jobs/{job.id}"
+    return resp, 202
+
+# --- Background jobs ---
+# Long admin work runs on the job runner instead of a web request:
+# POST /api/admin/jobs {"kind": ..., "params": {...}} returns 202 right away;
+# poll /api/admin/jobs/<id> for status/progress and fetch /result when done.
+# Set JOB_WORKERS=0 on web processes to run jobs only in job_worker.py.
+JOB_SEED_DIR = os.path.abspath(os.environ.get("JOB_SEED_DIR", basedir))
+JOB_LIST_MAX = 200
+
+job_runner = jobs.JobRunner(app, db, Job)
+
+
+@job_runner.handler('analytics')
+def _analytics_job(params, report):
+    return admin_analytics(
+        sort=params.get('sort', 'id'), order=params.get('order', 'asc'),
+        limit=params.get('limit'), offset=params.get('offset', 0),
+    )
 
-    return jsonify({
-        'total_quizzes_taken': total_quizzes,
-        'average_score_all_users': avg_score,
-        'performance_by_category': performance_by_category,
-        'user_analytics': user_analytics
-    }), 200
+
+@job_runner.handler('regrade')
+def _regrade_job(params, report):
+    user_ids = params.get('userIds')
+    total = db.session.query(db.func.count(QuizAttempt.id)).filter(QuizAttempt.is_complete == True)
+    if user_ids is not None:
+        total = total.filter(QuizAttempt.user_id.in_(user_ids))
+    total = total.scalar() or 0
+    return regrade_attempts(
+        user_ids, progress=lambda scanned: report(scanned / total if total else 1.0, f"{scanned}/{total} attempts"),
+    )
+
+
+@job_runner.handler('reseed')
+def _reseed_job(params, report):
+    import seed  # seed imports this module; resolve lazily
+
+    path = os.path.abspath(os.path.join(JOB_SEED_DIR, params.get('path') or 'questions.csv'))
+    if os.path.commonpath([path, JOB_SEED_DIR]) != JOB_SEED_DIR or not os.path.isfile(path):
+        raise ValueError(f"no CSV named {params.get('path')!r} in the seed directory")
+    result = seed.seed(
+        path,
+        chunk_size=int(params.get('chunkSize') or 1000),
+        incremental=bool(params.get('incremental')),
+        reset_all=bool(params.get('resetAll')),
+    )
+    # Other processes notice the bumped bank version on their next check;
+    # this one can drop its snapshot now
+    invalidate_question_cache()
+    errors = result.pop('errors')
+    result['error_count'] = len(errors)
+    result['errors'] = [list(e) for e in errors[:100]]
+    return result
+
+
+@app.route('/api/admin/jobs', methods=['POST'])
+@admin_required
+def submit_job(current_user):
+    data = request.get_json(silent=True) or {}
+    params = data.get('params') or {}
+    if not isinstance(params, dict):
+        return jsonify({'message': 'params must be an object'}), 400
+    try:
+        job = job_runner.submit(data.get('kind'), params, created_by=current_user.id)
+    except jobs.UnknownJobKind:
+        return jsonify({'message': 'kind must be one of: ' + ', '.join(sorted(job_runner.handlers))}), 400
+    resp = jsonify(job.to_dict())
+    resp.headers['Location'] = f"/api/admin/jobs/{job.id}"
+    return resp, 202
+
+
+@app.route('/api/admin/jobs', methods=['GET'])
+@admin_required
+def list_jobs(current_user):
+    query = Job.query
+    if request.args.get('status'):
+        query = query.filter(Job.status == request.args['status'])
+    if request.args.get('kind'):
+        query = query.filter(Job.kind == request.args['kind'])
+    limit = min(max(request.args.get('limit', 50, type=int), 1), JOB_LIST_MAX)
+    return jsonify([_job_view(job) for job in query.order_by(Job.id.desc()).limit(limit)]), 200
+
+
+def _job_view(job, include_result=False):
+    data = job.to_dict(include_result)
+    live = job_runner.live_progress(job.id) if job.status == jobs.RUNNING else None
+    if live:
+        data['progress'], data['progress_detail'] = live['progress'], live['detail']
+    return data
+
+
+@app.route('/api/admin/jobs/<int:job_id>', methods=['GET'])
+@admin_required
+def get_job(current_user, job_id):
+    job = db.session.get(Job, job_id)
+    if job is None:
+        return jsonify({'message': 'Job not found'}), 404
+    return jsonify(_job_view(job)), 200
+
+
+@app.route('/api/admin/jobs/<int:job_id>/result', methods=['GET'])
+@admin_required
+def get_job_result(current_user, job_id):
+    job = db.session.get(Job, job_id)
+    if job is None:
+        return jsonify({'message': 'Job not found'}), 404
+    if job.status != jobs.SUCCEEDED:
+        return jsonify({'message': f'Job is {job.status}', 'job': _job_view(job)}), 409
+    return raw_json_response(dumps_json(job.result), 200)
+
+
+@app.route('/api/admin/jobs/<int:job_id>/cancel', methods=['POST'])
+@admin_required
+def cancel_job(current_user, job_id):
+    job = db.session.get(Job, job_id)
+    if job is None:
+        return jsonify({'message': 'Job not found'}), 404
+    if not job_runner.cancel(job_id):
+        return jsonify({'message': 'Only queued jobs can be cancelled'}), 409
+    db.session.refresh(job)
+    return jsonify(job.to_dict()), 200
+
+# --- Bulk export ---
+# Attempt histories and per-user category analytics stream from a
+# server-side cursor (yield_per) in EXPORT_BATCH_SIZE batches, so memory
+# stays flat however many rows match. Filters are applied in SQL:
+#   ?from=2024-09-01&to=2025-06-01   attempt timestamp in [from, to)
+#   ?userId=42 (repeatable)          only these users
+#   ?category=Finance (repeatable)   attempts graded in any of these categories
+#   ?complete=1|0                    completion state (attempts only)
+# The "export" job writes the same rows to EXPORT_DIR as csv, ndjson or
+# parquet (parquet needs pyarrow).
+EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", "1000"))
+EXPORT_DIR = os.path.abspath(os.environ.get("EXPORT_DIR", os.path.join(basedir, "exports")))
+EXPORT_MIMETYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+
+def export_filters(args):
+    """Validated filters from request args (MultiDict) or job params (dict)."""
+    def values(key):
+        if hasattr(args, 'getlist'):
+            return args.getlist(key)
+        value = args.get(key)
+        return [] if value is None else value if isinstance(value, list) else [value]
+
+    filters = {}
+    for key in ('from', 'to'):
+        raw = values(key)
+        if raw:
+            try:
+                parsed = datetime.fromisoformat(str(raw[0]))
+            except ValueError:
+                raise ValueError(f'{key} must be an ISO date or datetime')
+            if parsed.tzinfo is not None:
+                parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+            filters[key] = parsed
+    if values('userId'):
+        try:
+            filters['user_ids'] = [int(u) for u in values('userId')]
+        except (TypeError, ValueError):
+            raise ValueError('userId must be an integer')
+    categories = [str(c) for c in values('category') if c]
+    if categories:
+        filters['categories'] = categories
+    if values('complete'):
+        filters['complete'] = str(values('complete')[0]).lower() in ('1', 'true', 'yes')
+    return filters
+
+
+def _attempt_export_query(filters):
+    query = (
+        db.session.query(
+            QuizAttempt.id, QuizAttempt.user_id, User.username, QuizAttempt.test_name, QuizAttempt.score,
+            QuizAttempt.total_questions, QuizAttempt.timestamp, QuizAttempt.is_complete,
+            QuizAttempt.results_by_category, QuizAttempt.question_ids, QuizAttempt.answers,
+        )
+        .join(User, User.id == QuizAttempt.user_id)
+    )
+    if 'from' in filters:
+        query = query.filter(QuizAttempt.timestamp >= filters['from'])
+    if 'to' in filters:
+        query = query.filter(QuizAttempt.timestamp < filters['to'])
+    if 'user_ids' in filters:
+        query = query.filter(QuizAttempt.user_id.in_(filters['user_ids']))
+    if 'categories' in filters:
+        query = query.filter(db.or_(*[
+            QuizAttempt.results_by_category[c].as_string().isnot(None) for c in filters['categories']
+        ]))
+    if 'complete' in filters:
+        query = query.filter(QuizAttempt.is_complete == filters['complete'])
+    return query.order_by(QuizAttempt.timestamp, QuizAttempt.id)
+
+
+def _analytics_export_query(filters):
+    query = (
+        db.session.query(
+            UserCategoryProgress.user_id, User.username, UserCategoryProgress.category,
+            UserCategoryProgress.correct, UserCategoryProgress.total,
+            UserCategoryProgress.attempt_count, UserCategoryProgress.last_attempt_at,
+        )
+        .join(User, User.id == UserCategoryProgress.user_id)
+    )
+    if 'from' in filters:
+        query = query.filter(UserCategoryProgress.last_attempt_at >= filters['from'])
+    if 'to' in filters:
+        query = query.filter(UserCategoryProgress.last_attempt_at < filters['to'])
+    if 'user_ids' in filters:
+        query = query.filter(UserCategoryProgress.user_id.in_(filters['user_ids']))
+    if 'categories' in filters:
+        query = query.filter(UserCategoryProgress.category.in_(filters['categories']))
+    return query.order_by(UserCategoryProgress.user_id, UserCategoryProgress.category)
+
+
+# kind -> (query builder, [(field, type)]); types drive CSV cells and parquet columns
+EXPORTS = {
+    'attempts': (_attempt_export_query, [
+        ('id', 'int'), ('user_id', 'int'), ('username', 'str'), ('test_name', 'str'), ('score', 'int'),
+        ('total_questions', 'int'), ('timestamp', 'datetime'), ('is_complete', 'bool'),
+        ('results_by_category', 'json'), ('question_ids', 'json'), ('answers', 'json'),
+    ]),
+    'analytics': (_analytics_export_query, [
+        ('user_id', 'int'), ('username', 'str'), ('category', 'str'), ('correct', 'int'),
+        ('total', 'int'), ('attempt_count', 'int'), ('last_attempt_at', 'datetime'),
+    ]),
+}
+
+
+def export_rows(kind, filters):
+    """Stream matching rows as tuples, EXPORT_BATCH_SIZE at a time.
+
+    Incomplete attempts get their buffered answers overlaid (one
+    pending_answers() lookup per batch), so they export as resume shows them.
+    """
+    build, fields = EXPORTS[kind]
+    rows = build(filters).execution_options(yield_per=EXPORT_BATCH_SIZE)
+    if kind != 'attempts':
+        yield from rows
+        return
+    names = [name for name, _ in fields]
+    id_at, complete_at, answers_at = names.index('id'), names.index('is_complete'), names.index('answers')
+
+    def overlay(batch):
+        pending = pending_answers([row[id_at] for row in batch if not row[complete_at]])
+        for row in batch:
+            if row[id_at] in pending:
+                row = list(row)
+                row[answers_at] = {**(row[answers_at] or {}), **pending[row[id_at]]}
+                row = tuple(row)
+            yield row
+
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= EXPORT_BATCH_SIZE:
+            yield from overlay(batch)
+            batch = []
+    yield from overlay(batch)
+
+
+def export_chunks(kind, filters, fmt, progress=None):
+    """Yield the export as text chunks of about EXPORT_BATCH_SIZE rows.
+
+    ``progress`` is called with the running row count after each chunk.
+    """
+    fields = EXPORTS[kind][1]
+    names = [name for name, _ in fields]
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    if fmt == 'csv':
+        writer.writerow(names)
+    pending = rows = 0
+    for row in export_rows(kind, filters):
+        if fmt == 'csv':
+            writer.writerow([
+                '' if value is None
+                else value.isoformat() if kind_ == 'datetime'
+                else json.dumps(value, separators=(',', ':')) if kind_ == 'json'
+                else value
+                for value, (_, kind_) in zip(row, fields)
+            ])
+        else:
+            buf.write(json.dumps({
+                name: value.isoformat() if kind_ == 'datetime' and value is not None else value
+                for value, (name, kind_) in zip(row, fields)
+            }, separators=(',', ':')))
+            buf.write('\n')
+        pending += 1
+        if pending >= EXPORT_BATCH_SIZE:
+            rows += pending
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+            pending = 0
+            if progress:
+                progress(rows)
+    if buf.tell():
+        yield buf.getvalue()
+    if progress:
+        progress(rows + pending)
+
+
+def _load_pyarrow():
+    """pyarrow is optional and slow to import, so only load it for parquet jobs."""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        return None
+    return pyarrow
+
+
+def _write_parquet(kind, filters, path, report):
+    pyarrow = _load_pyarrow()
+    fields = EXPORTS[kind][1]
+    types = {'int': pyarrow.int64(), 'str': pyarrow.string(), 'bool': pyarrow.bool_(),
+             'datetime': pyarrow.timestamp('us'), 'json': pyarrow.string()}
+    schema = pyarrow.schema([(name, types[kind_]) for name, kind_ in fields])
+    rows = 0
+    columns = [[] for _ in fields]
+
+    def flush(writer):
+        writer.write_table(pyarrow.Table.from_arrays(
+            [pyarrow.array(values, type=schema.field(i).type) for i, values in enumerate(columns)], schema=schema,
+        ))
+        for values in columns:
+            values.clear()
+
+    with pyarrow.parquet.ParquetWriter(path, schema) as writer:
+        for row in export_rows(kind, filters):
+            for i, (value, (_, kind_)) in enumerate(zip(row, fields)):
+                columns[i].append(json.dumps(value) if kind_ == 'json' and value is not None else value)
+            rows += 1
+            if len(columns[0]) >= EXPORT_BATCH_SIZE:
+                flush(writer)
+                report(rows)
+        if columns[0] or rows == 0:
+            flush(writer)
+    return rows
+
+
+@job_runner.handler('export')
+def _export_job(params, report):
+    kind = params.get('kind', 'attempts')
+    fmt = params.get('format', 'csv')
+    if kind not in EXPORTS:
+        raise ValueError('kind must be one of: ' + ', '.join(EXPORTS))
+    if fmt not in ('csv', 'ndjson', 'parquet'):
+        raise ValueError("format must be 'csv', 'ndjson' or 'parquet'")
+    if fmt == 'parquet' and _load_pyarrow() is None:
+        raise ValueError('parquet export needs pyarrow installed')
+    filters = export_filters(params)
+    total = EXPORTS[kind][0](filters).order_by(None).count()
+    progress = lambda rows: report(rows / total if total else 1.0, f"{rows}/{total} rows")
+
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    name = f"{kind}-{datetime.utcnow():%Y%m%dT%H%M%S%f}.{fmt}"
+    path = os.path.join(EXPORT_DIR, name)
+    if fmt == 'parquet':
+        rows = _write_parquet(kind, filters, path, progress)
+    else:
+        written = []
+
+        def count(rows):
+            written[:] = [rows]
+            progress(rows)
+
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            for chunk in export_chunks(kind, filters, fmt, count):
+                f.write(chunk)
+        rows = written[0]
+    return {'file': name, 'rows': rows, 'bytes': os.path.getsize(path),
+            'download': f"/api/admin/export/files/{name}"}
+
+
+@app.route('/api/admin/export/<kind>', methods=['GET'])
+@admin_required
+def export_stream(current_user, kind):
+    if kind not in EXPORTS:
+        return jsonify({'message': 'export must be one of: ' + ', '.join(EXPORTS)}), 404
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_MIMETYPES:
+        return jsonify({'message': "format must be 'csv' or 'ndjson'"}), 400
+    try:
+        filters = export_filters(request.args)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    resp = Response(stream_with_context(export_chunks(kind, filters, fmt)), mimetype=EXPORT_MIMETYPES[fmt])
+    resp.headers['Content-Disposition'] = f'attachment; filename="{kind}.{fmt}"'
+    resp.headers['Cache-Control'] = 'no-store'
+    return resp
+
+
+@app.route('/api/admin/export/files/<name>', methods=['GET'])
+@admin_required
+def export_file(current_user, name):
+    return send_from_directory(EXPORT_DIR, name, as_attachment=True)
 
 # --- Other endpoints ---
 @app.route('/api/quiz/answer', methods=['POST'])
-@token_required
+@token_required(claims_only=True)
+@user_rate_limited(quiz_answer_limiter)
 def save_answer(current_user):
     data = request.get_json() or {}
     attempt_id = data.get('attemptId')
     question_id = data.get('questionId')
     answer = data.get('answer')
-    attempt = QuizAttempt.query.filter_by(id=attempt_id, user_id=current_user.id).first()
-    if not attempt:
+    try:
+        question_id = int(question_id)
+    except (TypeError, ValueError):
+        return jsonify({'message': 'questionId required'}), 400
+    # Ownership check without loading the JSON columns
+    owned = (
+        db.session.query(QuizAttempt.id, QuizAttempt.is_complete)
+        .filter_by(id=attempt_id, user_id=current_user.id)
+        .first()
+    )
+    if not owned:
         return jsonify({'message': 'Attempt not found'}), 404
-    new_answers = attempt.answers.copy()
-    new_answers[str(question_id)] = answer
-    attempt.answers = new_answers
+    if owned.is_complete:
+        return jsonify({'message': 'Attempt already submitted'}), 409
+    upsert_attempt_answers([{
+        'attempt_id': owned.id,
+        'question_id': question_id,
+        'answer': answer,
+        'answered_at': datetime.utcnow(),
+    }])
     db.session.commit()
     return jsonify({'message': 'Answer saved'}), 200
 
+ANSWER_BATCH_MAX = 500
+
+
+def _parse_client_timestamp(value, now):
+    """ISO-8601 string or epoch milliseconds -> naive UTC datetime, clamped to now."""
+    if value is None:
+        return now
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        parsed = datetime.utcfromtimestamp(value / 1000.0)
+    elif isinstance(value, str):
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    else:
+        raise ValueError('unsupported timestamp')
+    # A client clock running ahead must not pin an answer forever.
+    return min(parsed, now)
+
+@app.route('/api/quiz/answers', methods=['POST'])
+@token_required(claims_only=True)
+@user_rate_limited(quiz_answer_limiter)
+def save_answers_batch(current_user):
+    """Apply many answers to one attempt in a single transaction.
+
+    Body: {"attemptId": 1, "answers": [{"questionId": 7, "answer": "B",
+    "answeredAt": "2024-03-01T10:00:00Z"}, ...]}. ``answeredAt`` (ISO string
+    or epoch ms) is optional; when present, the newest answer per question
+    wins, so replayed offline queues cannot overwrite later choices.
+    """
+    data = request.get_json() or {}
+    attempt_id = data.get('attemptId')
+    items = data.get('answers')
+    if not isinstance(items, list):
+        return jsonify({'message': 'answers must be a list'}), 400
+    if len(items) > ANSWER_BATCH_MAX:
+        return jsonify({'message': f'At most {ANSWER_BATCH_MAX} answers per batch'}), 413
+
+    owned = (
+        db.session.query(QuizAttempt.id, QuizAttempt.is_complete)
+        .filter_by(id=attempt_id, user_id=current_user.id)
+        .first()
+    )
+    if not owned:
+        return jsonify({'message': 'Attempt not found'}), 404
+    if owned.is_complete:
+        return jsonify({'message': 'Attempt already submitted'}), 409
+
+    now = datetime.utcnow()
+    latest = {}
+    for item in items:
+        if not isinstance(item, dict):
+            return jsonify({'message': 'Each answer must be an object'}), 400
+        try:
+            question_id = int(item.get('questionId'))
+            answered_at = _parse_client_timestamp(item.get('answeredAt'), now)
+        except (TypeError, ValueError, OverflowError, OSError):
+            return jsonify({'message': 'Each answer needs a questionId and a valid answeredAt'}), 400
+        previous = latest.get(question_id)
+        if previous is None or previous['answered_at'] <= answered_at:
+            latest[question_id] = {
+                'attempt_id': owned.id,
+                'question_id': question_id,
+                'answer': item.get('answer'),
+                'answered_at': answered_at,
+            }
+
+    upsert_attempt_answers(list(latest.values()), last_write_wins=True)
+    db.session.commit()
+    return jsonify({'message': 'Answers saved', 'saved': len(latest)}), 200
+
+ATTEMPTS_PAGE_MAX = 100
+
 @app.route('/api/user/attempts', methods=['GET'])
 @token_required
+@http_cached()
 def get_user_attempts(current_user):
+    # ?view=summary or ?limit=N switches to the paged summary projection:
+    # no question_ids/answers blobs, keyset pagination on (timestamp, id).
+    # The body stays a list; the next page's cursor is in X-Next-Cursor.
+    limit = request.args.get('limit', type=int)
+    if limit is not None or request.args.get('view') == 'summary':
+        return _user_attempts_page(current_user.id, limit)
+
     attempts = (
         QuizAttempt.query
         .filter_by(user_id=current_user.id)
         .order_by(QuizAttempt.timestamp.desc())
         .all()
     )
-    return jsonify([a.to_dict() for a in attempts])
+    pending = pending_answers([a.id for a in attempts if not a.is_complete])
+    results = []
+    for a in attempts:
+        item = a.to_dict()
+        if a.id in pending:
+            item['answers'] = {**(item['answers'] or {}), **pending[a.id]}
+        results.append(item)
+    return jsonify(results)
+
+def _user_attempts_page(user_id, limit):
+    limit = min(max(limit or ATTEMPTS_PAGE_MAX, 1), ATTEMPTS_PAGE_MAX)
+    query = (
+        QuizAttempt.query
+        .options(load_only(*(getattr(QuizAttempt, c) for c in QuizAttempt.SUMMARY_COLUMNS)))
+        .filter(QuizAttempt.user_id == user_id)
+    )
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            ts_raw, id_raw = cursor.rsplit(',', 1)
+            cursor_ts, cursor_id = datetime.fromisoformat(ts_raw), int(id_raw)
+        except ValueError:
+            return jsonify({'message': 'Invalid cursor'}), 400
+        query = query.filter(db.or_(
+            QuizAttempt.timestamp < cursor_ts,
+            db.and_(QuizAttempt.timestamp == cursor_ts, QuizAttempt.id < cursor_id),
+        ))
+    attempts = (
+        query.order_by(QuizAttempt.timestamp.desc(), QuizAttempt.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+    resp = jsonify([a.to_summary_dict() for a in attempts[:limit]])
+    if len(attempts) > limit:
+        last = attempts[limit - 1]
+        resp.headers['X-Next-Cursor'] = f"{last.timestamp.isoformat()},{last.id}"
+        resp.headers['Access-Control-Expose-Headers'] = 'X-Next-Cursor'
+    return resp
+
+@app.route('/api/user/attempts/<int:attempt_id>', methods=['GET'])
+@token_required
+@http_cached()
+def get_user_attempt(current_user, attempt_id):
+    attempt = QuizAttempt.query.filter_by(id=attempt_id, user_id=current_user.id).first()
+    if not attempt:
+        return jsonify({'message': 'Attempt not found'}), 404
+    item = attempt.to_dict()
+    if not attempt.is_complete:
+        pending = pending_answers([attempt.id]).get(attempt.id)
+        if pending:
+            item['answers'] = {**(item['answers'] or {}), **pending}
+    return jsonify(item), 200
 
 @app.route('/api/quiz/resume/<int:attempt_id>', methods=['GET'])
 @token_required
+@http_cached()
 def resume_quiz(current_user, attempt_id):
     attempt = QuizAttempt.query.filter_by(id=attempt_id, user_id=current_user.id).first()
     if not attempt:
         return jsonify({'message': 'Attempt not found'}), 404
-    qs = Question.query.filter(Question.id.in_(attempt.question_ids)).all()
-    id_to_q = {q.id: q for q in qs}
-    ordered = [id_to_q[qid] for qid in attempt.question_ids if qid in id_to_q]
-    return jsonify({
-        'questions': [q.to_dict() for q in ordered],
-        'answersSoFar': attempt.answers
-    }), 200
+    if fold_pending_answers(attempt):
+        db.session.commit()
+    body = (
+        b'{"questions":' + get_question_snapshot().json_array(attempt.question_ids)
+        + b',"answersSoFar":' + dumps_json(attempt.answers) + b'}'
+    )
+    return raw_json_response(body, 200)
+
+# Windowed question delivery for attempts started with includeQuestions=false.
+QUESTION_PAGE_DEFAULT = 25
+QUESTION_PAGE_MAX = 200
+QUESTION_STREAM_WINDOW = 50
+
+@app.route('/api/quiz/questions/<int:attempt_id>', methods=['GET'])
+@token_required(claims_only=True)
+@http_cached()
+def get_attempt_questions(current_user, attempt_id):
+    attempt = QuizAttempt.query.filter_by(id=attempt_id, user_id=current_user.id).first()
+    if not attempt:
+        return jsonify({'message': 'Attempt not found'}), 404
+
+    question_ids = attempt.question_ids
+    total = len(question_ids)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    snapshot = get_question_snapshot()
+
+    wants_ndjson = (
+        request.args.get('format') == 'ndjson'
+        or 'application/x-ndjson' in request.headers.get('Accept', '')
+    )
+    if wants_ndjson:
+        # One question per line, emitted in windows so the first questions
+        # reach the client before the rest are assembled.
+        limit = request.args.get('limit', total, type=int)
+        end = min(offset + max(limit, 0), total)
+
+        def generate():
+            encoded = snapshot.json_by_id
+            for start in range(offset, end, QUESTION_STREAM_WINDOW):
+                window = question_ids[start:min(start + QUESTION_STREAM_WINDOW, end)]
+                yield b"".join(encoded[qid] + b"\n" for qid in window if qid in encoded)
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    limit = request.args.get('limit', QUESTION_PAGE_DEFAULT, type=int)
+    limit = min(max(limit, 1), QUESTION_PAGE_MAX)
+    window = question_ids[offset:offset + limit]
+    next_offset = offset + limit if offset + limit < total else None
+    body = (
+        b'{"attemptId":' + dumps_json(attempt.id)
+        + b',"offset":' + dumps_json(offset)
+        + b',"limit":' + dumps_json(limit)
+        + b',"total":' + dumps_json(total)
+        + b',"nextOffset":' + dumps_json(next_offset)
+        + b',"questions":' + snapshot.json_array(window) + b'}'
+    )
+    return raw_json_response(body, 200)
+
+QUESTIONS_MAX_AGE = int(os.environ.get("QUESTIONS_MAX_AGE", "60"))
 
 @app.route('/api/questions')
+@http_cached(scope="public", max_age=QUESTIONS_MAX_AGE, version=_bank_version_key, server_cache=True)
 def get_questions():
-    query = db.select(Question)
     categories = request.args.get('categories')
     difficulties = request.args.get('difficulties')
-    if categories:
-        query = query.where(Question.category.in_(categories.split(',')))
-    if difficulties:
-        query = query.where(Question.difficulty.in_(difficulties.split(',')))
-    questions = db.session.execute(query).scalars().all()
-    return jsonify([q.to_dict() for q in questions])
+    snapshot = get_question_snapshot()
+    ids = snapshot.select(
+        categories.split(',') if categories else None,
+        difficulties.split(',') if difficulties else None,
+    )
+    return raw_json_response(snapshot.json_array(ids))
+
+QUIZ_CONFIG_MAX_AGE = int(os.environ.get("QUIZ_CONFIG_MAX_AGE", "60"))
 
 @app.route('/api/quiz-config')
+@http_cached(scope="public", max_age=QUIZ_CONFIG_MAX_AGE, version=lambda: get_question_snapshot().config_etag)
 def get_quiz_config():
-    categories = db.session.query(Question.category).distinct().all()
-    difficulties = db.session.query(Question.difficulty).distinct().all()
-    return jsonify({
-        'categories': [c[0] for c in categories],
-        'difficulties': [d[0] for d in difficulties]
-    })
+    # Prebuilt with the question snapshot; rebuilt only when the bank changes.
+    snapshot = get_question_snapshot()
+    resp = raw_json_response(snapshot.config_json)
+    resp.last_modified = snapshot.updated_at
+    return resp
+
+def _metrics_response():
+    resp = make_response(metrics.registry.expose())
+    resp.mimetype = 'text/plain'
+    resp.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    return resp
+
+@admin_required
+def _admin_metrics(current_user):
+    return _metrics_response()
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    # Prometheus text format. Route names, timings and pool stats are not
+    # public: scrapers send METRICS_TOKEN, everyone else must be an admin.
+    if METRICS_TOKEN and hmac.compare_digest((_bearer_token() or '').encode(), METRICS_TOKEN.encode()):
+        return _metrics_response()
+    return _admin_metrics()
 
 @app.route('/api/health', methods=['GET'])
 def health():
     return jsonify({
         'status': 'ok',
-        'time': datetime.utcnow().isoformat()
+        'time': datetime.utcnow().isoformat(),
+        'db_pool': dbpool.pool_stats.snapshot(db.engine.pool)
     }), 200
 
 
-# Create database tables if they don't exist
-with app.app_context():
-    try:
+# --- Startup ---
+# Importing this module does no database I/O. The engine opens its first
+# connection on first use; servers call create_app() at worker boot, which
+# starts pool warm-up and the job runner in the background. Tables and migrations are applied
+# explicitly, once:
+# `python init_db.py` (or seed.py, or `python app.py`) before starting the
+# servers, or SCHEMA_ON_STARTUP=1 to do it in create_app().
+SCHEMA_ON_STARTUP = os.environ.get("SCHEMA_ON_STARTUP", "0").strip().lower() in ("1", "true", "yes", "on")
+
+_startup_lock = threading.Lock()
+_engine_hooks_installed = False
+_schema_ready = False
+_pool_warmup_started = False
+
+
+def ensure_schema(force=False):
+    """Create missing tables, then apply pending migrations (once per process)."""
+    global _schema_ready
+    with _startup_lock:
+        if _schema_ready and not force:
+            return
         db.create_all()
-        print("✅ Database tables initialized successfully")
+        run_migrations(db.engine)
+        _schema_ready = True
+
+
+def create_app(schema=None, serving=True):
+    """Return the app, ready to serve (gunicorn: ``"app:create_app()"``).
+
+    Installs engine instrumentation once; with ``schema`` (default
+    SCHEMA_ON_STARTUP) also applies tables and migrations now. With
+    ``serving`` it starts opening DB_POOL_WARMUP connections and the job
+    runner (JOB_WORKERS > 0) in the background, so call it in the serving
+    process (after any fork).
+    """
+    global _engine_hooks_installed
+    with _startup_lock:
+        if not _engine_hooks_installed:
+            with app.app_context():
+                dbpool.instrument(db.engine)
+                instrument_sql(db.engine)
+            _engine_hooks_installed = True
+    if SCHEMA_ON_STARTUP if schema is None else schema:
+        with app.app_context():
+            try:
+                ensure_schema()
+                print("✅ Database tables initialized successfully")
+            except Exception as e:
+                print(f"⚠️ Database initialization warning: {e}")
+    if serving:
+        start_pool_warmup()
+        job_runner.start()
+    return app
+
+
+def _warm_pool():
+    try:
+        with app.app_context():
+            dbpool.warm_up(db.engine)
     except Exception as e:
-        print(f"⚠️ Database initialization warning: {e}")
+        app.logger.warning("Connection pool warm-up failed: %s", e)
+
+
+def start_pool_warmup():
+    """Open DB_POOL_WARMUP connections off the request path (once per process)."""
+    global _pool_warmup_started
+    with _startup_lock:
+        if _pool_warmup_started:
+            return
+        _pool_warmup_started = True
+    threading.Thread(target=_warm_pool, name="db-pool-warmup", daemon=True).start()
+
+
+# Import-time setup only; servers call create_app() again to start warm-up and jobs
+create_app(serving=False)
 
 if __name__ == '__main__':
+    create_app(schema=True)
     # Get port from environment variable or default to 5000
     port = int(os.environ.get('PORT', 5000))
     # Bind to all interfaces in Docker
@@ -0,0 +1,227 @@
+# backend/bench_quiz_flow.py
+# Reproducible end-to-end benchmark of the quiz flow.
+#
+#   python bench_quiz_flow.py --json bench.json
+#   python bench_quiz_flow.py --bank-size 50000 --users 2000 --history 30 \
+#       --concurrency 100 --iterations 500 --json feature.json --compare main.json
+#
+# 1. Builds a synthetic database (temp SQLite file unless --database-url):
+#    a question bank of --bank-size rows over --categories x --difficulties,
+#    --users users (user 1 is admin) and --history completed attempts each.
+# 2. Starts the backend under gunicorn (see loadtest_serving.py).
+# 3. Runs --iterations virtual quiz-takers, --concurrency at a time:
+#    login -> quiz-config -> start -> N x answer -> submit -> progress ->
+#    admin analytics.
+# 4. Prints p50/p95/p99 and throughput per endpoint and optionally saves them
+#    as JSON. --compare fails (exit 1) if any endpoint's p95 regressed by more
+#    than --max-regression percent against an earlier JSON result.
+#
+# --seed makes the synthetic data and question choices reproducible.
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from loadtest_serving import (BASEDIR, Client, free_port, server_env, start_server, summarize, timed_caller,
+                              write_bank)
+
+PASSWORD = "password123"
+
+
+def build_database(env, args, categories, difficulties):
+    """Seed bank, users and attempt history straight through the app's models."""
+    os.environ.update(env)
+    sys.path.insert(0, BASEDIR)
+    import app as backend
+    import passwords
+    import seed
+
+    rng = random.Random(args.seed)
+    bank = tempfile.mktemp(suffix=".csv")
+    write_bank(bank, args.bank_size, categories, difficulties, rng)
+    seed.seed(bank, chunk_size=2000, reset_all=True)
+    os.unlink(bank)
+
+    db = backend.db
+    with backend.app.app_context():
+        password_hash = passwords._hash(PASSWORD.encode(), 4).decode()
+        db.session.execute(db.insert(backend.User), [
+            {"id": n, "username": f"bench{n}", "password_hash": password_hash, "is_admin": n == 1}
+            for n in range(1, args.users + 1)
+        ])
+        snapshot = backend.get_question_snapshot(force=True)
+        question_ids = list(snapshot.ids)
+        now = datetime.utcnow()
+        batch = []
+        for user_id in range(1, args.users + 1):
+            for h in range(args.history):
+                ids = rng.sample(question_ids, min(args.answers, len(question_ids)))
+                answers = {str(q): rng.choice("ABCD") for q in ids}
+                results = {}
+                for q in ids:
+                    question = snapshot.get(q)
+                    r = results.setdefault(question["category"], {"correct": 0, "total": 0})
+                    r["total"] += 1
+                    r["correct"] += answers[str(q)] == question["correctAnswer"]
+                correct = sum(r["correct"] for r in results.values())
+                batch.append({
+                    "test_name": "Synthetic history", "score": int(correct * 100 / len(ids)),
+                    "total_questions": len(ids), "user_id": user_id,
+                    "timestamp": now - timedelta(hours=h + 1, minutes=user_id % 60),
+                    "question_ids": ids, "answers": answers, "is_complete": True,
+                    "results_by_category": results,
+                })
+                if len(batch) >= 2000:
+                    db.session.execute(db.insert(backend.QuizAttempt), batch)
+                    batch = []
+        if batch:
+            db.session.execute(db.insert(backend.QuizAttempt), batch)
+        db.session.commit()
+        backend.ensure_progress_backfilled()
+
+
+async def virtual_user(n, port, args, categories, timings, errors):
+    client = Client(port)
+    call = timed_caller(client, timings, errors)
+    rng = random.Random(args.seed * 100003 + n)
+    try:
+        user_id = 2 + n % max(args.users - 1, 1) if args.users > 1 else 1
+        login = await call("login", "POST", "/api/auth/credentials",
+                           {"username": f"bench{user_id}", "password": PASSWORD})
+        token = login["token"]
+        await call("quiz_config", "GET", "/api/quiz-config")
+        picked = rng.sample(categories, rng.randint(1, len(categories)))
+        quiz = await call("start", "POST", "/api/quiz/start", {
+            "categories": picked, "questionCount": args.answers, "includeQuestions": False,
+        }, token)
+        attempt_id = quiz["attemptId"]
+        if args.batch_answers:
+            await call("answers_batch", "POST", "/api/quiz/answers", {
+                "attemptId": attempt_id,
+                "answers": [{"questionId": q, "answer": rng.choice("ABCD")} for q in quiz["questionIds"]],
+            }, token)
+        else:
+            for q in quiz["questionIds"]:
+                await call("answer", "POST", "/api/quiz/answer",
+                           {"attemptId": attempt_id, "questionId": q, "answer": rng.choice("ABCD")}, token)
+        await call("submit", "POST", "/api/quiz/submit", {"attemptId": attempt_id, "score": 0}, token)
+        await call("progress", "GET", "/api/user/progress?limit=50", token=token)
+        if args.admin_token:
+            await call("admin_analytics", "GET", "/api/admin/analytics?limit=50", token=args.admin_token)
+    except RuntimeError:
+        pass
+    finally:
+        client.close()
+
+
+async def drive(port, args, categories):
+    admin = Client(port)
+    status, data = await admin.request("POST", "/api/auth/credentials",
+                                       {"username": "bench1", "password": PASSWORD})
+    admin.close()
+    args.admin_token = data["token"] if status == 200 else None
+
+    timings, errors = defaultdict(list), defaultdict(int)
+    gate = asyncio.Semaphore(args.concurrency)
+
+    async def one(n):
+        async with gate:
+            await virtual_user(n, port, args, categories, timings, errors)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(n) for n in range(args.iterations)))
+    return timings, errors, time.perf_counter() - started
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BASEDIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(result, baseline_path, max_regression):
+    with open(baseline_path) as f:
+        baseline = json.load(f)["result"]["endpoints"]
+    regressions = 0
+    print(f"\nvs {baseline_path} (p95):")
+    for name, current in sorted(result["endpoints"].items()):
+        before = baseline.get(name)
+        if not before or not before["p95_ms"]:
+            print(f"  {name:<16} new")
+            continue
+        change = (current["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100
+        flag = change > max_regression
+        regressions += flag
+        print(f"  {name:<16} {before['p95_ms']:>9} -> {current['p95_ms']:>9} ms  {change:+6.1f}%{'  REGRESSION' if flag else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the quiz flow end to end.")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--database-url", help="defaults to a fresh temp SQLite file")
+    parser.add_argument("--bank-size", type=int, default=5000)
+    parser.add_argument("--categories", type=int, default=6)
+    parser.add_argument("--difficulties", type=int, default=3)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--history", type=int, default=10, help="completed attempts per seeded user")
+    parser.add_argument("--iterations", type=int, default=200, help="virtual quiz-takers to run")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--answers", type=int, default=20, help="questions per quiz")
+    parser.add_argument("--batch-answers", action="store_true", help="use /api/quiz/answers")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="earlier JSON result to compare against")
+    parser.add_argument("--max-regression", type=float, default=20.0, help="allowed p95 increase, percent")
+    args = parser.parse_args()
+
+    categories = [f"Category {i + 1}" for i in range(args.categories)]
+    difficulties = [f"Level {i + 1}" for i in range(args.difficulties)]
+    database_url = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    env = server_env(database_url, args.threads)
+
+    started = time.perf_counter()
+    build_database(env, args, categories, difficulties)
+    print(f"Seeded {args.bank_size} questions, {args.users} users, "
+          f"{args.users * args.history} attempts in {time.perf_counter() - started:.1f}s")
+
+    port = free_port()
+    proc = start_server(port, env, args.threads)
+    try:
+        timings, errors, elapsed = asyncio.run(drive(port, args, categories))
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+    result = summarize(timings, errors, elapsed)
+    print(f"\n{result['requests']} requests in {elapsed:.1f}s ({result['throughput_rps']} req/s)")
+    print(f"{'endpoint':<16} {'count':>7} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, s in result["endpoints"].items():
+        print(f"{name:<16} {s['count']:>7} {s['errors']:>7} {s['p50_ms']:>9} {s['p95_ms']:>9} {s['p99_ms']:>9}")
+
+    if args.json:
+        params = {k: v for k, v in vars(args).items() if k not in ("admin_token", "json", "compare")}
+        with open(args.json, "w") as f:
+            json.dump({
+                "revision": git_revision(),
+                "created": datetime.utcnow().isoformat(),
+                "params": params,
+                "result": result,
+            }, f, indent=2)
+
+    if args.compare and compare(result, args.compare, args.max_regression):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# backend/bench_startup.py
+# Measures cold-start cost of a backend process.
+#
+#   python bench_startup.py                          # lazy startup (default)
+#   python bench_startup.py --schema-on-startup      # old behaviour: schema at boot
+#   python bench_startup.py --server --runs 5        # real gunicorn worker boot
+#   python bench_startup.py --database-url postgresql://user@10.255.255.1/db
+#
+# Every run is a fresh interpreter. In-process runs report the time to
+# import the app module, the first /api/health (no DB) and the first
+# /api/quiz-config (first DB use). --server runs report the time from spawn
+# until the port accepts connections and until /api/health answers.
+# Point --database-url at an unreachable host to check that boot no longer
+# waits on the database.
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from loadtest_serving import BASEDIR, free_port, server_env, start_server
+
+CHILD = r"""
+import json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.app.test_client()
+client.get('/api/health')
+health = time.perf_counter()
+status = client.get('/api/quiz-config').status_code
+config = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'first_health_ms': (health - imported) * 1000,
+    'first_db_request_ms': (config - health) * 1000,
+    'db_status': status,
+}))
+"""
+
+
+def run_in_process(env):
+    out = subprocess.run([sys.executable, "-c", CHILD], cwd=BASEDIR, env=env,
+                         capture_output=True, text=True, timeout=120)
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr.strip().splitlines()[-1] if out.stderr else "child failed")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def run_server(env, threads):
+    port = free_port()
+    started = time.perf_counter()
+    proc = start_server(port, env, threads)
+    listening = time.perf_counter()
+    try:
+        urllib.request.urlopen(f"http://127.0.0.1:{port}/api/health", timeout=30).read()
+        answered = time.perf_counter()
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+    return {'listen_ms': (listening - started) * 1000, 'first_health_ms': (answered - started) * 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure backend cold-start time.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--database-url", help="defaults to a temp SQLite file with the schema applied")
+    parser.add_argument("--schema-on-startup", action="store_true", help="set SCHEMA_ON_STARTUP=1")
+    parser.add_argument("--server", action="store_true", help="time a real gunicorn boot instead")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    database_url = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/startup.db"
+    env = server_env(database_url, args.threads)
+    env["SCHEMA_ON_STARTUP"] = "1" if args.schema_on_startup else "0"
+    if not args.database_url:
+        subprocess.run([sys.executable, "init_db.py"], cwd=BASEDIR, env=env, check=True, stdout=subprocess.DEVNULL)
+
+    runs = []
+    for _ in range(args.runs):
+        runs.append(run_server(env, args.threads) if args.server else run_in_process(env))
+
+    summary = {
+        key: {'median': round(statistics.median(r[key] for r in runs), 1),
+              'min': round(min(r[key] for r in runs), 1),
+              'max': round(max(r[key] for r in runs), 1)}
+        for key in runs[0] if key.endswith('_ms')
+    }
+    mode = "gunicorn" if args.server else "in-process"
+    print(f"{mode}, SCHEMA_ON_STARTUP={env['SCHEMA_ON_STARTUP']}, {args.runs} runs")
+    for key, s in summary.items():
+        print(f"  {key:<22} median {s['median']:>8} ms   min {s['min']:>8}   max {s['max']:>8}")
+    if 'db_status' in runs[0]:
+        print(f"  first DB request status: {runs[0]['db_status']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({'mode': mode, 'schema_on_startup': args.schema_on_startup,
+                       'summary': summary, 'runs': runs}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
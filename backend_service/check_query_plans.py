@@ -0,0 +1,87 @@
+# backend/check_query_plans.py
+# Runs EXPLAIN on the hot queries and fails if any of them falls back to a
+# full table scan. Run it against a migrated database (SQLite or Postgres):
+#
+#   python check_query_plans.py            # exit code 1 on a regression
+#
+# On Postgres, sequential scans are disabled for the session so the planner
+# reveals whether a usable index exists even on tiny tables.
+
+import sys
+
+from sqlalchemy import text
+
+from app import app, db, ensure_schema, Question, QuizAttempt, AttemptAnswer, UserCategoryProgress
+
+
+def hot_queries():
+    """(name, SQLAlchemy select) pairs mirroring the endpoints' filters."""
+    return [
+        ("questions by category/difficulty",
+         db.select(Question.id)
+         .where(Question.category.in_(["Finance"]), Question.difficulty.in_(["Easy"]))),
+        ("user attempts, newest first",
+         db.select(QuizAttempt.id)
+         .where(QuizAttempt.user_id == 1)
+         .order_by(QuizAttempt.timestamp.desc(), QuizAttempt.id.desc())),
+        ("completed attempts for progress series",
+         db.select(QuizAttempt.timestamp)
+         .where(QuizAttempt.user_id == 1, QuizAttempt.is_complete == True)
+         .order_by(QuizAttempt.timestamp.asc())),
+        ("attempt by id for its owner",
+         db.select(QuizAttempt.id).where(QuizAttempt.id == 1, QuizAttempt.user_id == 1)),
+        ("admin per-user aggregates",
+         db.select(QuizAttempt.user_id, db.func.count(QuizAttempt.id))
+         .where(QuizAttempt.is_complete == True)
+         .group_by(QuizAttempt.user_id)),
+        ("buffered answers for an attempt",
+         db.select(AttemptAnswer.question_id).where(AttemptAnswer.attempt_id == 1)),
+        ("attempt export by date range",
+         db.select(QuizAttempt.id)
+         .where(QuizAttempt.timestamp >= "2024-01-01", QuizAttempt.timestamp < "2025-01-01")
+         .order_by(QuizAttempt.timestamp, QuizAttempt.id)),
+        ("progress aggregates for a user",
+         db.select(UserCategoryProgress.category).where(UserCategoryProgress.user_id == 1)),
+    ]
+
+
+def explain(conn, dialect, stmt):
+    sql = str(stmt.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+    prefix = "EXPLAIN QUERY PLAN " if dialect == "sqlite" else "EXPLAIN "
+    rows = conn.execute(text(prefix + sql)).fetchall()
+    # SQLite: (id, parent, notused, detail); Postgres: (QUERY PLAN,)
+    return [str(row[-1]) for row in rows]
+
+
+def is_full_scan(dialect, plan_lines):
+    for line in plan_lines:
+        if dialect == "sqlite":
+            if line.startswith("SCAN ") and " USING " not in line:
+                return True
+        elif "Seq Scan" in line:
+            return True
+    return False
+
+
+def main():
+    failures = 0
+    with app.app_context():
+        ensure_schema()
+        with db.engine.connect() as conn:
+            dialect = conn.dialect.name
+            if dialect == "postgresql":
+                conn.execute(text("SET enable_seqscan = off"))
+            for name, stmt in hot_queries():
+                plan = explain(conn, dialect, stmt)
+                bad = is_full_scan(dialect, plan)
+                failures += bad
+                print(f"{'❌' if bad else '✅'} {name}")
+                for line in plan:
+                    print(f"     {line}")
+    if failures:
+        print(f"{failures} hot query(ies) use a full table scan")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
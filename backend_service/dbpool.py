@@ -0,0 +1,149 @@
+# backend/dbpool.py
+# Connection pool configuration, metrics and warm-up for the SQLAlchemy engine.
+#
+# Environment (Postgres and other server databases; SQLite keeps its defaults):
+#   DB_POOL_SIZE=5            persistent connections per process
+#   DB_MAX_OVERFLOW=10        extra connections allowed under burst
+#   DB_POOL_TIMEOUT=10        seconds to wait for a free connection
+#   DB_POOL_RECYCLE=1800      reconnect connections older than this (seconds)
+#   DB_POOL_PRE_PING=1        test connections on checkout; drop dead ones
+#   DB_POOL_WARMUP=<size>     connections to open at startup (0 = off)
+#   DB_PGBOUNCER=0            transaction-pooling mode: no server-side
+#                             prepared statements, no client-side pool
+
+import os
+import threading
+from time import perf_counter
+
+from sqlalchemy import event
+from sqlalchemy.pool import NullPool, QueuePool
+
+
+def _env_bool(name, default):
+    return os.environ.get(name, "1" if default else "0").strip().lower() in ("1", "true", "yes", "on")
+
+
+class PoolStats:
+    """Process-wide pool counters (thread-safe)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.connects = 0          # new DBAPI connections opened
+        self.checkouts = 0
+        self.checked_out = 0       # currently in use
+        self.invalidated = 0       # dropped by pre-ping or errors
+        self.wait_count = 0
+        self.wait_total = 0.0      # seconds spent waiting for a connection
+        self.wait_max = 0.0
+
+    def record_wait(self, seconds):
+        with self._lock:
+            self.wait_count += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def bump(self, field, delta=1):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + delta)
+
+    def snapshot(self, pool=None):
+        with self._lock:
+            data = {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checked_out": self.checked_out,
+                "invalidated": self.invalidated,
+                "wait_count": self.wait_count,
+                "wait_seconds_total": round(self.wait_total, 6),
+                "wait_seconds_max": round(self.wait_max, 6),
+            }
+        if pool is not None and hasattr(pool, "size"):
+            data["pool_size"] = pool.size()
+            data["overflow"] = pool.overflow()
+        return data
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long checkouts wait for a connection."""
+
+    def _do_get(self):
+        started = perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_stats.record_wait(perf_counter() - started)
+
+
+def engine_options(database_url, connect_args=None):
+    """SQLALCHEMY_ENGINE_OPTIONS for ``database_url`` from the environment."""
+    options = {}
+    connect_args = dict(connect_args or {})
+    if database_url.startswith("sqlite"):
+        if connect_args:
+            options["connect_args"] = connect_args
+        return options
+
+    if _env_bool("DB_PGBOUNCER", False):
+        # PgBouncer owns pooling; server-side prepared statements would break
+        # under transaction pooling, so disable them for drivers that use them.
+        options["poolclass"] = NullPool
+        if "+psycopg" in database_url and "+psycopg2" not in database_url:
+            connect_args["prepare_threshold"] = None
+        elif "+asyncpg" in database_url:
+            connect_args["statement_cache_size"] = 0
+    else:
+        options.update(
+            poolclass=InstrumentedQueuePool,
+            pool_size=int(os.environ.get("DB_POOL_SIZE", "5")),
+            max_overflow=int(os.environ.get("DB_MAX_OVERFLOW", "10")),
+            pool_timeout=float(os.environ.get("DB_POOL_TIMEOUT", "10")),
+            pool_recycle=int(os.environ.get("DB_POOL_RECYCLE", "1800")),
+        )
+    options["pool_pre_ping"] = _env_bool("DB_POOL_PRE_PING", True)
+    if connect_args:
+        options["connect_args"] = connect_args
+    return options
+
+
+def instrument(engine):
+    """Attach pool event listeners that feed pool_stats."""
+    pool = engine.pool
+
+    @event.listens_for(pool, "connect")
+    def _on_connect(dbapi_conn, record):
+        pool_stats.bump("connects")
+
+    @event.listens_for(pool, "checkout")
+    def _on_checkout(dbapi_conn, record, proxy):
+        pool_stats.bump("checkouts")
+        pool_stats.bump("checked_out")
+
+    @event.listens_for(pool, "checkin")
+    def _on_checkin(dbapi_conn, record):
+        pool_stats.bump("checked_out", -1)
+
+    @event.listens_for(pool, "invalidate")
+    def _on_invalidate(dbapi_conn, record, exception):
+        pool_stats.bump("invalidated")
+
+
+def warm_up(engine, count=None):
+    """Open ``count`` connections now so early requests skip connect/TLS setup."""
+    if engine.dialect.name == "sqlite" or isinstance(engine.pool, NullPool):
+        return 0
+    if count is None:
+        count = int(os.environ.get("DB_POOL_WARMUP", engine.pool.size()))
+    conns = []
+    try:
+        for _ in range(max(count, 0)):
+            conns.append(engine.connect())
+    finally:
+        for conn in conns:
+            conn.close()
+    return len(conns)
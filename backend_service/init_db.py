@@ -3,9 +3,9 @@ import sys
 sys.path.append('.')           # ensure repo root is on sys.path
 sys.path.append('backend')     # ensure backend/ is importable
 
-from app import db, app
+from app import app, ensure_schema
 
 if __name__ == "__main__":
     with app.app_context():
-        db.create_all()
-        print("✅ Database tables created.")
+        ensure_schema()
+        print("✅ Database tables created and migrations applied.")
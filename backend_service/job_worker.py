@@ -0,0 +1,13 @@
+# backend/job_worker.py
+# Dedicated background job process.
+#
+#   JOB_WORKERS=4 python job_worker.py
+#
+# Runs the same job runner the web processes use (see jobs.py). Pair it with
+# JOB_WORKERS=0 on the web processes to keep heavy jobs off web workers.
+
+from app import job_runner
+
+if __name__ == "__main__":
+    print(f"Job worker {job_runner.owner} polling with {max(job_runner.workers, 1)} threads")
+    job_runner.run_forever()
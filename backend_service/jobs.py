@@ -0,0 +1,227 @@
+# backend/jobs.py
+# In-process background job runner backed by the app's own database.
+#
+# Jobs are rows in the `job` table (see Job in app.py), so they survive
+# restarts and every web process can see every job. Each process that runs
+# a JobRunner polls for queued jobs and claims one with a conditional UPDATE
+# (status queued -> running), so a job runs exactly once even with several
+# gunicorn workers. Handlers run on a small thread pool inside an app
+# context; progress is kept in memory and flushed to the row together with a
+# heartbeat, so a handler holding a long write transaction never blocks on
+# its own progress updates.
+#
+# Environment:
+#   JOB_WORKERS=2             handler threads per process (0 = never run jobs here)
+#   JOB_POLL_INTERVAL=2       seconds between polls for queued jobs
+#   JOB_HEARTBEAT_INTERVAL=5  seconds between progress/heartbeat flushes
+#   JOB_STALE_AFTER=300       running jobs without a heartbeat this long are failed
+
+import os
+import socket
+import threading
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+from sqlalchemy.exc import OperationalError
+
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", "2"))
+JOB_HEARTBEAT_INTERVAL = float(os.environ.get("JOB_HEARTBEAT_INTERVAL", "5"))
+JOB_STALE_AFTER = float(os.environ.get("JOB_STALE_AFTER", "300"))
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class UnknownJobKind(ValueError):
+    pass
+
+
+class JobRunner:
+    """Claims and executes queued jobs for one process."""
+
+    def __init__(self, app, db, model, workers=JOB_WORKERS):
+        self.app, self.db, self.model = app, db, model
+        self.workers = workers
+        self.handlers = {}
+        # hostname:pid plus a random token, so a restarted process that gets
+        # the same pid (common in containers) is not mistaken for the old one
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._executor = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._active = {}  # job id -> {'progress': float, 'detail': str}
+
+    def handler(self, kind):
+        """Register ``fn(params, report) -> result`` for jobs of ``kind``.
+
+        ``report(fraction, detail=None)`` records progress (0.0-1.0). The
+        result must be JSON-serializable.
+        """
+        def register(fn):
+            self.handlers[kind] = fn
+            return fn
+        return register
+
+    # --- Submitting and reading ---
+
+    def submit(self, kind, params=None, created_by=None):
+        if kind not in self.handlers:
+            raise UnknownJobKind(kind)
+        job = self.model(kind=kind, params=params or {}, status=QUEUED, progress=0.0,
+                         created_by=created_by, created_at=datetime.utcnow())
+        self.db.session.add(job)
+        self.db.session.commit()
+        self.start()
+        self._wake.set()
+        return job
+
+    def live_progress(self, job_id):
+        """In-memory progress for a job running in this process, if any."""
+        with self._lock:
+            state = self._active.get(job_id)
+            return dict(state) if state else None
+
+    def cancel(self, job_id):
+        """Cancel a queued job. Returns False if it already started or finished."""
+        result = self.db.session.execute(
+            update(self.model)
+            .where(self.model.id == job_id, self.model.status == QUEUED)
+            .values(status=CANCELLED, finished_at=datetime.utcnow())
+        )
+        self.db.session.commit()
+        return result.rowcount == 1
+
+    # --- Running ---
+
+    def start(self):
+        """Start the poll loop (idempotent; no-op when JOB_WORKERS is 0)."""
+        if self.workers <= 0 or self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+            self._thread = threading.Thread(target=self._loop, name="job-runner", daemon=True)
+            self._thread.start()
+
+    def stop(self, wait=True):
+        self._stop.set()
+        self._wake.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+
+    def run_forever(self):
+        """Run the poll loop in the calling thread (dedicated worker process)."""
+        self.workers = max(self.workers, 1)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+        self._loop()
+
+    def _loop(self):
+        last_heartbeat = 0.0
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    now = datetime.utcnow().timestamp()
+                    if now - last_heartbeat >= JOB_HEARTBEAT_INTERVAL:
+                        self._heartbeat()
+                        self._fail_stale()
+                        last_heartbeat = now
+                    self._claim_available()
+            except Exception:
+                traceback.print_exc()
+            self._wake.wait(JOB_POLL_INTERVAL)
+            self._wake.clear()
+
+    def _claim_available(self):
+        db, Job = self.db, self.model
+        while True:
+            with self._lock:
+                free = self.workers - len(self._active)
+            if free <= 0:
+                return
+            candidates = [
+                job_id for (job_id,) in db.session.query(Job.id)
+                .filter(Job.status == QUEUED).order_by(Job.id).limit(free)
+            ]
+            db.session.rollback()
+            if not candidates:
+                return
+            claimed = False
+            for job_id in candidates:
+                now = datetime.utcnow()
+                result = db.session.execute(
+                    update(Job)
+                    .where(Job.id == job_id, Job.status == QUEUED)
+                    .values(status=RUNNING, started_at=now, heartbeat_at=now, worker=self.owner)
+                )
+                db.session.commit()
+                if result.rowcount == 1:
+                    claimed = True
+                    with self._lock:
+                        self._active[job_id] = {'progress': 0.0, 'detail': None}
+                    self._executor.submit(self._execute, job_id)
+            if not claimed:
+                return
+
+    def _execute(self, job_id):
+        db, Job = self.db, self.model
+        with self.app.app_context():
+            job = db.session.get(Job, job_id)
+            kind, params = job.kind, dict(job.params or {})
+            db.session.rollback()
+
+            def report(fraction, detail=None):
+                with self._lock:
+                    self._active[job_id] = {'progress': max(0.0, min(float(fraction), 1.0)), 'detail': detail}
+
+            try:
+                result = self.handlers[kind](params, report)
+                values = {'status': SUCCEEDED, 'result': result, 'progress': 1.0}
+            except Exception as e:
+                db.session.rollback()
+                traceback.print_exc()
+                values = {'status': FAILED, 'error': f"{type(e).__name__}: {e}"}
+            finally:
+                with self._lock:
+                    state = self._active.pop(job_id, None)
+            if values['status'] == FAILED and state:
+                values['progress'] = state['progress']
+                values['progress_detail'] = state['detail']
+            values['finished_at'] = datetime.utcnow()
+            db.session.execute(update(Job).where(Job.id == job_id).values(**values))
+            db.session.commit()
+        self._wake.set()
+
+    def _heartbeat(self):
+        with self._lock:
+            active = {job_id: dict(state) for job_id, state in self._active.items()}
+        if not active:
+            return
+        now = datetime.utcnow()
+        try:
+            with self.db.engine.begin() as conn:
+                for job_id, state in active.items():
+                    conn.execute(
+                        update(self.model)
+                        .where(self.model.id == job_id, self.model.status == RUNNING)
+                        .values(progress=state['progress'], progress_detail=state['detail'], heartbeat_at=now)
+                    )
+        except OperationalError:
+            # Database busy (e.g. SQLite locked by the job itself); next beat.
+            pass
+
+    def _fail_stale(self):
+        cutoff = datetime.utcnow() - timedelta(seconds=JOB_STALE_AFTER)
+        self.db.session.execute(
+            update(self.model)
+            .where(self.model.status == RUNNING, self.model.heartbeat_at < cutoff,
+                   self.model.worker != self.owner)
+            .values(status=FAILED, error="worker stopped responding", finished_at=datetime.utcnow())
+        )
+        self.db.session.commit()
@@ -0,0 +1,261 @@
+# backend/loadtest_serving.py
+# Load test of the production serving setup (gunicorn gthread worker) under
+# many concurrent quiz-takers.
+#
+#   python loadtest_serving.py --users 500 --concurrency 500 --answers 20
+#   python loadtest_serving.py --threads 15 --database-url postgresql://...
+#
+# The server runs on a fresh database (a temp SQLite file unless
+# --database-url is given). Every virtual user registers, starts a quiz,
+# answers --answers questions, submits and loads its progress over a
+# keep-alive connection. The client is asyncio-based so client-side
+# concurrency is not capped by threads.
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+BASEDIR = os.path.abspath(os.path.dirname(__file__))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+CATEGORIES = ["Business Management", "Finance", "Hospitality", "Marketing", "Entrepreneurship"]
+DIFFICULTIES = ["Easy", "Medium", "Hard"]
+
+
+def write_bank(path, size, categories=CATEGORIES, difficulties=DIFFICULTIES, rng=None):
+    """Write a synthetic bank CSV; with ``rng`` answers and difficulties are random."""
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "question", "optionA", "optionB", "optionC", "optionD",
+                         "correctAnswer", "explanation", "category", "difficulty"])
+        for i in range(1, size + 1):
+            answer = rng.choice("ABCD") if rng else "ABCD"[i % 4]
+            difficulty = rng.choice(difficulties) if rng else difficulties[i % len(difficulties)]
+            writer.writerow([i, f"Question {i}?", "a", "b", "c", "d", answer, "because",
+                             categories[i % len(categories)], difficulty])
+
+
+def server_env(database_url, threads):
+    env = dict(os.environ)
+    env.update({
+        "SECRET_KEY": env.get("SECRET_KEY", "loadtest-secret-key-loadtest-secret-key"),
+        "ADMIN_PASSCODE": env.get("ADMIN_PASSCODE", "loadtest"),
+        "SQLALCHEMY_DATABASE_URI": database_url,
+        "BCRYPT_ROUNDS": "4",
+        "PASSWORD_HASH_QUEUE_MAX": "100000",
+        "LOGIN_RATE_MAX": "0",
+        "QUIZ_START_RATE_MAX": "0",
+        "QUIZ_ANSWER_RATE_MAX": "0",
+    })
+    return env
+
+
+def prepare_database(env, bank_size):
+    bank = tempfile.mktemp(suffix=".csv")
+    write_bank(bank, bank_size)
+    subprocess.run([sys.executable, "seed.py", bank, "--reset-all"], cwd=BASEDIR, env=env,
+                   check=True, stdout=subprocess.DEVNULL)
+    os.unlink(bank)
+
+
+def start_server(port, env, threads):
+    cmd = [sys.executable, "-m", "gunicorn", "-w", "1", "--threads", str(threads),
+           "-b", f"127.0.0.1:{port}", "--backlog", "4096", "app:create_app()"]
+    proc = subprocess.Popen(cmd, cwd=BASEDIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("server did not start")
+
+
+class Client:
+    """Minimal HTTP/1.1 keep-alive JSON client."""
+
+    def __init__(self, port):
+        self.port = port
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=None, token=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection("127.0.0.1", self.port)
+        payload = json.dumps(body).encode() if body is not None else b""
+        headers = [f"{method} {path} HTTP/1.1", "Host: localhost", f"Content-Length: {len(payload)}"]
+        if body is not None:
+            headers.append("Content-Type: application/json")
+        if token:
+            headers.append(f"Authorization: Bearer {token}")
+        self.writer.write(("\r\n".join(headers) + "\r\n\r\n").encode() + payload)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("server closed the connection")
+        status = int(status_line.split()[1])
+        length, chunked, close = 0, False, False
+        while True:
+            line = (await self.reader.readline()).strip()
+            if not line:
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            name, value = name.lower(), value.strip().lower()
+            if name == "content-length":
+                length = int(value)
+            elif name == "transfer-encoding" and "chunked" in value:
+                chunked = True
+            elif name == "connection" and value == "close":
+                close = True
+        if chunked:
+            data = b""
+            while True:
+                size = int((await self.reader.readline()).strip(), 16)
+                chunk = await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+                data += chunk[:-2]
+        else:
+            data = await self.reader.readexactly(length)
+        if close:
+            self.close()
+        return status, (json.loads(data) if data else None)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = self.reader = None
+
+
+def timed_caller(client, timings, errors):
+    """Return ``call(name, method, path, body=None, token=None)`` for ``client``.
+
+    Each call's latency goes to ``timings[name]``; connection errors and
+    HTTP >= 400 count in ``errors[name]`` and raise RuntimeError.
+    """
+    async def call(name, method, path, body=None, token=None):
+        started = time.perf_counter()
+        try:
+            status, data = await client.request(method, path, body, token)
+        except (OSError, ConnectionError, asyncio.IncompleteReadError) as e:
+            client.close()
+            errors[name] += 1
+            raise RuntimeError(str(e))
+        timings[name].append(time.perf_counter() - started)
+        if status >= 400:
+            errors[name] += 1
+            raise RuntimeError(f"{name} -> {status}")
+        return data
+    return call
+
+
+async def virtual_user(n, port, answers, timings, errors):
+    client = Client(port)
+    call = timed_caller(client, timings, errors)
+    try:
+        user = await call("register", "POST", "/api/register",
+                          {"username": f"load{n}-{os.getpid()}", "password": "password123"})
+        token = user["token"]
+        quiz = await call("start", "POST", "/api/quiz/start",
+                          {"questionCount": answers, "includeQuestions": False}, token)
+        for qid in quiz["questionIds"]:
+            await call("answer", "POST", "/api/quiz/answer",
+                       {"attemptId": quiz["attemptId"], "questionId": qid, "answer": "A"}, token)
+        await call("submit", "POST", "/api/quiz/submit", {"attemptId": quiz["attemptId"], "score": 0}, token)
+        await call("progress", "GET", "/api/user/progress?limit=20", token=token)
+    except RuntimeError:
+        pass
+    finally:
+        client.close()
+
+
+async def drive(port, users, concurrency, answers):
+    timings, errors = defaultdict(list), defaultdict(int)
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one(n):
+        async with gate:
+            await virtual_user(n, port, answers, timings, errors)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(n) for n in range(users)))
+    return timings, errors, time.perf_counter() - started
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))]
+
+
+def summarize(timings, errors, elapsed):
+    total = sum(len(v) for v in timings.values())
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "requests": total,
+        "throughput_rps": round(total / elapsed, 1) if elapsed else 0.0,
+        "endpoints": {
+            name: {
+                "count": len(values),
+                "errors": errors.get(name, 0),
+                "p50_ms": round(percentile(values, 50) * 1000, 2),
+                "p95_ms": round(percentile(values, 95) * 1000, 2),
+                "p99_ms": round(percentile(values, 99) * 1000, 2),
+            }
+            for name, values in timings.items()
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the gunicorn serving setup.")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--answers", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=15,
+                        help="gunicorn --threads (default: the default DB pool size + overflow)")
+    parser.add_argument("--bank-size", type=int, default=2000)
+    parser.add_argument("--database-url", help="defaults to a fresh temp SQLite file")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    database_url = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/loadtest.db"
+    env = server_env(database_url, args.threads)
+    prepare_database(env, args.bank_size)
+    port = free_port()
+    proc = start_server(port, env, args.threads)
+    try:
+        timings, errors, elapsed = asyncio.run(drive(port, args.users, args.concurrency, args.answers))
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+    result = summarize(timings, errors, elapsed)
+
+    print(f"\n{result['requests']} requests in {elapsed:.1f}s ({result['throughput_rps']} req/s)")
+    print(f"{'endpoint':<10} {'count':>7} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, s in result["endpoints"].items():
+        print(f"{name:<10} {s['count']:>7} {s['errors']:>7} {s['p50_ms']:>9} {s['p95_ms']:>9} {s['p99_ms']:>9}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "result": result}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# backend/metrics.py
+# Tiny in-process metrics registry with Prometheus text exposition.
+#
+# Counters and histograms are keyed by a tuple of label values. Everything is
+# per process; with several gunicorn workers each one reports its own series
+# (scrape them individually or aggregate in Prometheus).
+
+import threading
+from bisect import bisect_left
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name, self.help, self.labels = name, help_text, tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        return self._values.get(label_values, 0)
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels = name, help_text, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_labels(self.labels, key, ('le', bound))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_labels(self.labels, key, ('le', '+Inf'))} {series[-2]}")
+                lines.append(f"{self.name}_count{_labels(self.labels, key)} {series[-2]}")
+                lines.append(f"{self.name}_sum{_labels(self.labels, key)} {round(series[-1], 6)}")
+        return lines
+
+
+class Gauges:
+    """Values read from a callback at scrape time: fn() -> {name: value}."""
+
+    def __init__(self, prefix, help_text, fn):
+        self.prefix, self.help, self.fn = prefix, help_text, fn
+
+    def expose(self):
+        lines = []
+        for name, value in sorted(self.fn().items()):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                lines.append(f"# HELP {self.prefix}_{name} {self.help}")
+                lines.append(f"# TYPE {self.prefix}_{name} gauge")
+                lines.append(f"{self.prefix}_{name} {value}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def expose(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.expose())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route, method and status.", ("route", "method", "status")))
+http_latency = registry.register(Histogram(
+    "http_request_duration_seconds", "Request latency by route.", ("route", "method")))
+http_response_bytes = registry.register(Histogram(
+    "http_response_bytes", "Serialized response body size by route.", ("route",), SIZE_BUCKETS))
+sql_queries_per_request = registry.register(Histogram(
+    "sql_queries_per_request", "SQL statements executed per request.", ("route",), COUNT_BUCKETS))
+sql_time_per_request = registry.register(Histogram(
+    "sql_seconds_per_request", "Time spent in SQL per request.", ("route",)))
+sql_query_duration = registry.register(Histogram(
+    "sql_query_duration_seconds", "Duration of individual SQL statements.", ("operation",)))
+cache_lookups = registry.register(Counter(
+    "cache_lookups_total", "In-process cache lookups by cache and result (hit/miss).", ("cache", "result")))
+slow_requests = registry.register(Counter(
+    "http_slow_requests_total", "Requests slower than SLOW_REQUEST_MS.", ("route",)))
+
+
+def cache_result(cache, hit):
+    cache_lookups.inc(cache, "hit" if hit else "miss")
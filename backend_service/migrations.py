@@ -0,0 +1,58 @@
+# backend/migrations.py
+# Minimal forward-only schema migrations for existing SQLite/Postgres databases.
+#
+# db.create_all() only creates missing tables; it never adds indexes or
+# columns to tables that already exist. Each migration below is a list of
+# portable SQL statements, applied once and recorded in schema_migrations.
+# Statements are idempotent (IF NOT EXISTS) so they are safe on databases
+# where create_all already built the objects from the model definitions.
+
+from datetime import datetime
+
+from sqlalchemy import text
+
+MIGRATIONS = [
+    ("0001_hot_filter_indexes", [
+        "CREATE INDEX IF NOT EXISTS ix_question_category_difficulty"
+        " ON question (category, difficulty)",
+        "CREATE INDEX IF NOT EXISTS ix_quiz_attempt_user_complete_ts"
+        " ON quiz_attempt (user_id, is_complete, timestamp)",
+        "CREATE INDEX IF NOT EXISTS ix_quiz_attempt_user_ts"
+        " ON quiz_attempt (user_id, timestamp, id)",
+        "CREATE INDEX IF NOT EXISTS ix_quiz_attempt_complete_user"
+        " ON quiz_attempt (is_complete, user_id)",
+    ]),
+    ("0002_attempt_export_index", [
+        "CREATE INDEX IF NOT EXISTS ix_quiz_attempt_ts_id"
+        " ON quiz_attempt (timestamp, id)",
+    ]),
+]
+
+
+def applied_migrations(conn):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        " id VARCHAR(128) PRIMARY KEY, applied_at TIMESTAMP NOT NULL)"
+    ))
+    return {row[0] for row in conn.execute(text("SELECT id FROM schema_migrations"))}
+
+
+def run_migrations(engine, log=print):
+    """Apply pending migrations in order, each in its own transaction."""
+    with engine.begin() as conn:
+        done = applied_migrations(conn)
+    applied = []
+    for migration_id, statements in MIGRATIONS:
+        if migration_id in done:
+            continue
+        with engine.begin() as conn:
+            for statement in statements:
+                conn.execute(text(statement))
+            conn.execute(
+                text("INSERT INTO schema_migrations (id, applied_at) VALUES (:id, :at)"),
+                {"id": migration_id, "at": datetime.utcnow()},
+            )
+        applied.append(migration_id)
+        if log:
+            log(f"✅ Applied migration {migration_id}")
+    return applied
@@ -0,0 +1,98 @@
+# backend/passwords.py
+# Password hashing and verification, run off the request thread in a small
+# bounded process pool so a login storm cannot pin every web worker on bcrypt.
+#
+# Kept free of Flask/app imports on purpose: pool workers only need bcrypt.
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+import bcrypt
+
+# Cost factor for new hashes. Existing hashes with a different cost are
+# upgraded transparently on the next successful login (see needs_rehash).
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))
+# 0 workers = hash inline in the calling thread (handy for scripts and tests).
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", "2"))
+# Hashes allowed in flight or queued per web process before we answer 503.
+PASSWORD_HASH_QUEUE_MAX = int(os.environ.get("PASSWORD_HASH_QUEUE_MAX", "16"))
+PASSWORD_HASH_TIMEOUT = float(os.environ.get("PASSWORD_HASH_TIMEOUT", "10"))
+
+
+class PasswordHasherBusy(Exception):
+    """The hashing pool is saturated; the caller should retry shortly."""
+
+
+# Pool workers are started from a clean forkserver (spawn where that is not
+# available) rather than forked from the web process: forking a process that
+# already runs threads, DB connections and locks can copy a held lock into
+# the child and hang it. As with any spawned pool, a script used as __main__
+# is re-imported in each worker, so keep its work under `if __name__ == ...`.
+_MP_CONTEXT = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(max(PASSWORD_HASH_QUEUE_MAX, 1))
+
+
+def _hash(password: bytes, rounds: int) -> bytes:
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+
+def _check(password: bytes, hashed: bytes) -> bool:
+    try:
+        return bcrypt.checkpw(password, hashed)
+    except ValueError:
+        # Malformed stored hash
+        return False
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS,
+                                                mp_context=multiprocessing.get_context(_MP_CONTEXT))
+    return _executor
+
+
+def _run(fn, *args):
+    if not _slots.acquire(blocking=False):
+        raise PasswordHasherBusy()
+    if PASSWORD_HASH_WORKERS <= 0:
+        try:
+            return fn(*args)
+        finally:
+            _slots.release()
+    try:
+        future = _get_executor().submit(fn, *args)
+    except BaseException:
+        _slots.release()
+        raise
+    # Hold the slot until the hash finishes, not until we stop waiting: a
+    # timed-out hash still occupies a pool worker, so it must still count.
+    future.add_done_callback(lambda _: _slots.release())
+    try:
+        return future.result(timeout=PASSWORD_HASH_TIMEOUT)
+    except FutureTimeout:
+        raise PasswordHasherBusy()
+
+
+def hash_password(password: str) -> str:
+    return _run(_hash, password.encode("utf-8"), BCRYPT_ROUNDS).decode("utf-8")
+
+
+def check_password(password: str, hashed: str) -> bool:
+    return _run(_check, password.encode("utf-8"), hashed.encode("utf-8"))
+
+
+def needs_rehash(hashed: str) -> bool:
+    """True if ``hashed`` was made with a cost other than BCRYPT_ROUNDS."""
+    try:
+        return int(hashed.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
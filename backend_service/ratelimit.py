@@ -0,0 +1,229 @@
+# backend/ratelimit.py
+# Sliding-window rate limiting with pluggable storage.
+#
+# Each key costs O(1) memory: the start of the current fixed window plus the
+# hit counts of the current and previous windows. The previous count is
+# weighted by how much of it still overlaps the sliding window, which
+# approximates a true sliding log without keeping timestamps.
+#
+# Backends (RATE_LIMIT_BACKEND):
+#   memory                 per-process LRU dict (default)
+#   sqlite:////path/file   shared by every worker/container mounting the file
+#   redis://host:6379/0    needs the optional `redis` package
+#   local-redis            in-process stand-in speaking the same Redis subset
+
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from time import time
+
+RATE_LIMIT_MAX_KEYS = int(os.environ.get("RATE_LIMIT_MAX_KEYS", "10000"))
+
+
+def _slide(state, limit, window, now):
+    """Advance one key's (window_start, current, previous) and count a hit.
+
+    Returns (limited, new_state). A limited hit is not counted, so a client
+    hammering the endpoint does not extend its own lockout.
+    """
+    current_start = now - (now % window)
+    if state is None:
+        start, current, previous = current_start, 0, 0
+    else:
+        start, current, previous = state
+        if start != current_start:
+            previous = current if current_start - start == window else 0
+            current = 0
+            start = current_start
+    weight = 1.0 - (now - start) / window
+    if previous * weight + current >= limit:
+        return True, (start, current, previous)
+    return False, (start, current + 1, previous)
+
+
+class MemoryBackend:
+    """Per-process store; the least recently used keys are evicted past max_keys."""
+
+    def __init__(self, max_keys=RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._state = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key, limit, window, now):
+        with self._lock:
+            limited, state = _slide(self._state.get(key), limit, window, now)
+            self._state[key] = state
+            self._state.move_to_end(key)
+            while len(self._state) > self.max_keys:
+                self._state.popitem(last=False)
+            return limited
+
+    def reset(self):
+        with self._lock:
+            self._state.clear()
+
+    def __len__(self):
+        return len(self._state)
+
+
+class SQLiteBackend:
+    """Counters in a SQLite file so every worker process shares one view."""
+
+    PRUNE_EVERY = 1000  # hits between sweeps of idle keys
+
+    def __init__(self, path, max_keys=RATE_LIMIT_MAX_KEYS):
+        self.path = path
+        self.max_keys = max_keys
+        self._local = threading.local()
+        self._hits = 0
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit ("
+                " key TEXT PRIMARY KEY, start REAL NOT NULL, current INTEGER NOT NULL,"
+                " previous INTEGER NOT NULL, expires REAL NOT NULL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def hit(self, key, limit, window, now):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT start, current, previous FROM rate_limit WHERE key = ?", (key,)
+            ).fetchone()
+            limited, (start, current, previous) = _slide(row, limit, window, now)
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_limit (key, start, current, previous, expires)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, start, current, previous, start + 2 * window),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._hits += 1
+        if self._hits % self.PRUNE_EVERY == 0:
+            self._prune(conn, now)
+        return limited
+
+    def _prune(self, conn, now):
+        # Idle keys carry no state once both windows have passed
+        conn.execute("DELETE FROM rate_limit WHERE expires < ?", (now,))
+        conn.execute(
+            "DELETE FROM rate_limit WHERE key IN ("
+            " SELECT key FROM rate_limit ORDER BY expires DESC LIMIT -1 OFFSET ?)",
+            (self.max_keys,),
+        )
+
+    def reset(self):
+        self._conn().execute("DELETE FROM rate_limit")
+
+
+class RedisBackend:
+    """Fixed-window counters in Redis (INCR/DECR/GET/EXPIRE), weighted as above.
+
+    ``client`` may be a redis-py client or LocalRedis.
+    """
+
+    def __init__(self, client, prefix="rl:"):
+        self.client = client
+        self.prefix = prefix
+
+    def hit(self, key, limit, window, now):
+        index = int(now // window)
+        current_key = f"{self.prefix}{key}:{index}"
+        current = int(self.client.incr(current_key))
+        if current == 1:
+            self.client.expire(current_key, int(window * 2) + 1)
+        previous = int(self.client.get(f"{self.prefix}{key}:{index - 1}") or 0)
+        weight = 1.0 - (now - index * window) / window
+        if previous * weight + current - 1 >= limit:
+            self.client.decr(current_key)
+            return True
+        return False
+
+
+class LocalRedis:
+    """Tiny in-process stand-in for the Redis commands RedisBackend uses."""
+
+    def __init__(self, max_keys=RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._data = OrderedDict()  # key -> [value, expires_at or None]
+        self._lock = threading.Lock()
+
+    def _live(self, key):
+        entry = self._data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time():
+            del self._data[key]
+            return None
+        return entry
+
+    def _add(self, key, delta):
+        with self._lock:
+            entry = self._live(key)
+            if entry is None:
+                entry = self._data[key] = [0, None]
+            entry[0] += delta
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_keys:
+                self._data.popitem(last=False)
+            return entry[0]
+
+    def incr(self, key):
+        return self._add(key, 1)
+
+    def decr(self, key):
+        return self._add(key, -1)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._live(key)
+            return None if entry is None else str(entry[0]).encode()
+
+    def expire(self, key, seconds):
+        with self._lock:
+            entry = self._live(key)
+            if entry is None:
+                return False
+            entry[1] = time() + seconds
+            return True
+
+
+def create_backend(url=None):
+    url = (url if url is not None else os.environ.get("RATE_LIMIT_BACKEND", "memory")).strip()
+    if url in ("", "memory", "memory://"):
+        return MemoryBackend()
+    if url.startswith("sqlite:///"):
+        return SQLiteBackend(url[len("sqlite:///"):])
+    if url == "local-redis":
+        return RedisBackend(LocalRedis())
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("RATE_LIMIT_BACKEND uses Redis but the `redis` package is not installed")
+        return RedisBackend(redis.Redis.from_url(url))
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {url}")
+
+
+class RateLimiter:
+    """Allow ``limit`` hits per ``window`` seconds per key. 0 disables."""
+
+    def __init__(self, name, limit, window, backend):
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self.backend = backend
+
+    def hit(self, key) -> bool:
+        """Record a hit for ``key``; True means the caller should be refused."""
+        if self.limit <= 0:
+            return False
+        return self.backend.hit(f"{self.name}:{key}", self.limit, self.window, time())
@@ -1,47 +1,193 @@
 # backend/seed.py
-# UPDATED: Added db.create_all() to ensure tables are created before seeding.
+# UPDATED: Streaming, chunked importer. Reads the CSV with the csv module
+# (no pandas), validates each row, upserts questions by id in bulk and bumps
+# the bank version. Users and attempts are left alone unless --reset-all.
+#
+#   python seed.py                       # replace the bank with questions.csv
+#   python seed.py --incremental         # only write new/changed rows, no deletes
+#   python seed.py path/to/bank.csv --error-log errors.csv --chunk-size 5000
 
+import argparse
+import csv
 import os
-import pandas as pd
-from app import app, db, Question, User, QuizAttempt # Import all models
+import re
+import sys
+from time import perf_counter
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app import (app, db, Question, User, QuizAttempt, AttemptAnswer, UserCategoryProgress,
+                 UserQuestionHistory, QuestionStat, bump_bank_version, ensure_schema)
 
-# Build Absolute Path to CSV
 basedir = os.path.abspath(os.path.dirname(__file__))
-csv_path = os.path.join(basedir, 'questions.csv')
-
-# Load the questions from the CSV file
-df = pd.read_csv(csv_path)
-
-# Drop rows where any required column is empty
-required_columns = ['category', 'optionA', 'optionB', 'optionC', 'optionD']
-df.dropna(subset=required_columns, inplace=True)
-
-with app.app_context():
-    # UPDATED: Create tables if they don't exist
-    db.create_all()
-
-    # Clear existing data from all tables
-    db.session.query(Question).delete()
-    db.session.query(QuizAttempt).delete()
-    db.session.query(User).delete()
-
-    # Iterate over the rows of the dataframe and add them to the database
-    for index, row in df.iterrows():
-        question = Question(
-            id=row['id'],
-            question=row['question'],
-            optionA=row['optionA'],
-            optionB=row['optionB'],
-            optionC=row['optionC'],
-            optionD=row['optionD'],
-            correctAnswer=row['correctAnswer'],
-            explanation=row['explanation'],
-            category=row['category'],
-            difficulty=row['difficulty']
+DEFAULT_CSV = os.path.join(basedir, 'questions.csv')
+
+REQUIRED = ['id', 'question', 'optionA', 'optionB', 'optionC', 'optionD',
+            'correctAnswer', 'category', 'difficulty']
+COLUMNS = REQUIRED + ['explanation']
+VALID_ANSWERS = {'A', 'B', 'C', 'D'}
+
+
+def parse_id(raw):
+    """Return ``raw`` as an int id, or raise ValueError (no floats, no rounding)."""
+    text = (raw or '').strip()
+    if not re.fullmatch(r'-?[0-9]+', text):
+        raise ValueError(f"id is not an integer: {raw!r}")
+    return int(text)
+
+
+def parse_row(row):
+    """Validate one CSV row and return Question column values, or raise ValueError."""
+    missing = [c for c in REQUIRED if not (row.get(c) or '').strip()]
+    if missing:
+        raise ValueError('missing ' + ', '.join(missing))
+    qid = parse_id(row['id'])
+    answer = row['correctAnswer'].strip().upper()
+    if answer not in VALID_ANSWERS:
+        raise ValueError(f"correctAnswer must be one of A-D, got {row['correctAnswer']!r}")
+    values = {c: row[c].strip() for c in COLUMNS if c in row and row[c] is not None}
+    values.update(id=qid, correctAnswer=answer, explanation=(row.get('explanation') or '').strip())
+    return values
+
+
+def read_chunks(path, chunk_size, errors):
+    """Yield lists of validated rows; invalid rows go to ``errors``."""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        absent = [c for c in REQUIRED if c not in (reader.fieldnames or [])]
+        if absent:
+            raise SystemExit(f"{path}: missing column(s): {', '.join(absent)}")
+        chunk = {}
+        for line_no, row in enumerate(reader, start=2):
+            try:
+                values = parse_row(row)
+            except ValueError as e:
+                errors.append((line_no, row.get('id', ''), str(e)))
+                continue
+            chunk[values['id']] = values  # a later duplicate id wins
+            if len(chunk) >= chunk_size:
+                yield list(chunk.values())
+                chunk = {}
+        if chunk:
+            yield list(chunk.values())
+
+
+def changed_rows(rows):
+    """Drop rows identical to what is already stored."""
+    existing = {
+        q.id: q for q in Question.query.filter(Question.id.in_([r['id'] for r in rows]))
+    }
+    return [
+        r for r in rows
+        if r['id'] not in existing
+        or any(getattr(existing[r['id']], c) != r[c] for c in COLUMNS if c != 'id')
+    ]
+
+
+def upsert_questions(rows):
+    if not rows:
+        return
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        insert = sqlite_insert if dialect == 'sqlite' else pg_insert
+        stmt = insert(Question).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['id'],
+            set_={c: stmt.excluded[c] for c in COLUMNS if c != 'id'},
         )
-        db.session.add(question)
+        db.session.execute(stmt)
+    else:
+        for row in rows:
+            db.session.merge(Question(**row))
+
+
+def seed(path, chunk_size=1000, incremental=False, reset_all=False, error_log=None):
+    errors = []
+    seen = set()
+    written = 0
+    started = perf_counter()
+
+    with app.app_context():
+        ensure_schema()
+
+        if reset_all:
+            # Old behaviour: wipe every user and attempt along with the bank
+            db.session.query(UserCategoryProgress).delete()
+            db.session.query(UserQuestionHistory).delete()
+            db.session.query(QuestionStat).delete()
+            db.session.query(AttemptAnswer).delete()
+            db.session.query(QuizAttempt).delete()
+            db.session.query(User).delete()
+
+        for rows in read_chunks(path, chunk_size, errors):
+            seen.update(r['id'] for r in rows)
+            if incremental:
+                rows = changed_rows(rows)
+            upsert_questions(rows)
+            written += len(rows)
+            db.session.flush()
+
+        deleted = 0
+        # A rejected row still names a question the file means to keep, so
+        # its stored copy must not be dropped as stale. If a rejected row has
+        # no usable id we cannot tell which question it was: skip the delete.
+        keep = set(seen)
+        unknown_rejects = False
+        for _, raw_id, _ in errors:
+            try:
+                keep.add(parse_id(raw_id))
+            except ValueError:
+                unknown_rejects = True
+        if not incremental and not unknown_rejects:
+            # Full mode replaces the bank: drop questions missing from the file
+            stale = [qid for (qid,) in db.session.query(Question.id) if qid not in keep]
+            for i in range(0, len(stale), chunk_size):
+                batch = stale[i:i + chunk_size]
+                deleted += Question.query.filter(Question.id.in_(batch)).delete(synchronize_session=False)
+
+        # Let running servers know their cached question bank is stale
+        if written or deleted:
+            bump_bank_version()
+        db.session.commit()
+
+    if error_log and errors:
+        with open(error_log, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['line', 'id', 'error'])
+            writer.writerows(errors)
+
+    return {
+        'rows': len(seen),
+        'written': written,
+        'deleted': deleted,
+        'errors': errors,
+        'seconds': perf_counter() - started,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Import the question bank from CSV.')
+    parser.add_argument('csv', nargs='?', default=DEFAULT_CSV)
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--incremental', action='store_true',
+                        help='only insert new or changed rows; never delete')
+    parser.add_argument('--reset-all', action='store_true',
+                        help='also delete all users and attempts (old seed behaviour)')
+    parser.add_argument('--error-log', help='write rejected rows to this CSV file')
+    args = parser.parse_args(argv)
+
+    result = seed(args.csv, args.chunk_size, args.incremental, args.reset_all, args.error_log)
+    for line_no, qid, message in result['errors'][:20]:
+        print(f"⚠️ line {line_no} (id {qid or '?'}): {message}", file=sys.stderr)
+    if len(result['errors']) > 20:
+        print(f"⚠️ ... {len(result['errors']) - 20} more rejected rows", file=sys.stderr)
+    print(
+        f"Database has been seeded: {result['rows']} valid rows, {result['written']} written, "
+        f"{result['deleted']} removed, {len(result['errors'])} rejected "
+        f"in {result['seconds']:.1f}s 🎉"
+    )
 
-    # Commit the changes to the database
-    db.session.commit()
 
-print(f"Database has been seeded with {len(df)} questions! 🎉")
\ No newline at end of file
+if __name__ == '__main__':
+    main()